@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Mic, Video, Send, Terminal, Code2, Play } from 'lucide-react';
 import { useParams } from 'react-router-dom';
 
@@ -8,6 +8,70 @@ const InterviewRoom = () => {
     const [messages, setMessages] = useState([
         { sender: 'AI', text: "Hello! I'm your TRACE AI interviewer. Let's start with a simple coding problem. Can you reverse an array in Python without using the built-in reverse method?" }
     ]);
+    const [answer, setAnswer] = useState('');
+    const [analysis, setAnalysis] = useState(null);
+    const [listening, setListening] = useState(false);
+    const socketRef = useRef(null);
+    const recognitionRef = useRef(null);
+
+    // Answers stream to the backend in chunks; it replies with rolling scores after each one
+    useEffect(() => {
+        const token = localStorage.getItem('token');
+        const socket = new WebSocket(
+            `ws://localhost:8000/ws/interview/${encodeURIComponent(sessionId || 'DEMO-123')}?token=${encodeURIComponent(token || '')}`
+        );
+        socket.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.type === 'score' || data.type === 'final') setAnalysis(data);
+        };
+        socketRef.current = socket;
+        return () => {
+            socket.close();
+            if (recognitionRef.current) recognitionRef.current.stop();
+        };
+    }, [sessionId]);
+
+    const sendChunk = (text) => {
+        const socket = socketRef.current;
+        if (text.trim() && socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ text: text + ' ' }));
+        }
+    };
+
+    const sendAnswer = () => {
+        if (!answer.trim()) return;
+        setMessages((previous) => [...previous, { sender: 'You', text: answer }]);
+        sendChunk(answer);
+        setAnswer('');
+    };
+
+    // Speech is transcribed in the browser; each finished phrase is sent as it's recognized
+    const toggleMic = () => {
+        const Recognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+        if (!Recognition) return;
+        if (listening) {
+            recognitionRef.current.stop();
+            return;
+        }
+        const recognition = new Recognition();
+        recognition.continuous = true;
+        recognition.onresult = (event) => {
+            for (let i = event.resultIndex; i < event.results.length; i++) {
+                if (event.results[i].isFinal) {
+                    const text = event.results[i][0].transcript;
+                    setMessages((previous) => [...previous, { sender: 'You', text }]);
+                    sendChunk(text);
+                }
+            }
+        };
+        recognition.onend = () => setListening(false);
+        recognition.start();
+        recognitionRef.current = recognition;
+        setListening(true);
+    };
+
+    const confidence = analysis ? Math.round(analysis.confidence * 100) : 0;
+    const skillScore = analysis ? analysis.skill_score : 0;
 
     return (
         <div className="pt-20 h-screen flex flex-col p-4 gap-4 overflow-hidden">
@@ -42,9 +106,16 @@ const InterviewRoom = () => {
                         ))}
                     </div>
                     <div className="p-4 border-t border-white/10 flex gap-2">
-                        <input type="text" placeholder="Type your answer..." className="flex-1 bg-dark rounded-lg border border-white/20 px-3 text-sm focus:border-primary outline-none" />
-                        <button className="p-2 bg-primary rounded-lg hover:bg-primary/90"><Send className="w-4 h-4" /></button>
-                        <button className="p-2 bg-white/10 rounded-lg hover:bg-white/20"><Mic className="w-4 h-4" /></button>
+                        <input
+                            type="text"
+                            placeholder="Type your answer..."
+                            className="flex-1 bg-dark rounded-lg border border-white/20 px-3 text-sm focus:border-primary outline-none"
+                            value={answer}
+                            onChange={(e) => setAnswer(e.target.value)}
+                            onKeyDown={(e) => e.key === 'Enter' && sendAnswer()}
+                        />
+                        <button onClick={sendAnswer} className="p-2 bg-primary rounded-lg hover:bg-primary/90"><Send className="w-4 h-4" /></button>
+                        <button onClick={toggleMic} className={`p-2 rounded-lg ${listening ? 'bg-red-500/40' : 'bg-white/10 hover:bg-white/20'}`}><Mic className="w-4 h-4" /></button>
                     </div>
                 </div>
 
@@ -80,21 +151,28 @@ const InterviewRoom = () => {
                                 <div>
                                     <div className="flex justify-between text-xs mb-1">
                                         <span>Confidence</span>
-                                        <span>88%</span>
+                                        <span>{confidence}%</span>
                                     </div>
                                     <div className="h-1.5 bg-white/10 rounded-full overflow-hidden">
-                                        <div className="h-full bg-green-500 w-[88%]"></div>
+                                        <div className="h-full bg-green-500" style={{ width: `${confidence}%` }}></div>
                                     </div>
                                 </div>
                                 <div>
                                     <div className="flex justify-between text-xs mb-1">
                                         <span>Sentiment</span>
-                                        <span>Positive</span>
+                                        <span className="capitalize">{analysis ? analysis.sentiment : '-'}</span>
+                                    </div>
+                                </div>
+                                <div>
+                                    <div className="flex justify-between text-xs mb-1">
+                                        <span>Skills</span>
+                                        <span>{skillScore}</span>
                                     </div>
                                     <div className="h-1.5 bg-white/10 rounded-full overflow-hidden">
-                                        <div className="h-full bg-blue-500 w-[75%]"></div>
+                                        <div className="h-full bg-blue-500" style={{ width: `${skillScore}%` }}></div>
                                     </div>
                                 </div>
+                                {analysis && <p className="text-xs text-gray-400">{analysis.feedback}</p>}
                             </div>
                         </div>
                     </div>
@@ -5,30 +5,69 @@ import { Search, Sparkles, User, Briefcase, Code, MapPin, Sliders, ExternalLink,
 const SearchPage = () => {
     const [query, setQuery] = useState('');
     const [results, setResults] = useState([]);
+    const [suggestions, setSuggestions] = useState([]);
     const [isFocused, setIsFocused] = useState(false);
     const [isLoading, setIsLoading] = useState(false);
     const [showFilters, setShowFilters] = useState(false);
     const [activeFilters, setActiveFilters] = useState({ verified: false, role: 'All' });
 
+    // Typeahead: cheap enough to ask on every keystroke
+    useEffect(() => {
+        if (!query.trim()) {
+            setSuggestions([]);
+            return;
+        }
+        const controller = new AbortController();
+        fetch(`http://localhost:8000/api/suggest?prefix=${encodeURIComponent(query)}`, { signal: controller.signal })
+            .then((response) => response.json())
+            .then((data) => setSuggestions(data.suggestions))
+            .catch(() => {});
+        return () => controller.abort();
+    }, [query]);
+
     // Debounce search
     useEffect(() => {
+        const controller = new AbortController();
         const fetchResults = async () => {
             setIsLoading(true);
             try {
                 // In production, use environment variable for API URL
-                const response = await fetch(`http://localhost:8000/api/search?query=${query}`);
-                const data = await response.json();
-                setResults(data.candidates);
+                // Streamed as NDJSON: each source's candidates show up as soon as it answers
+                const response = await fetch(
+                    `http://localhost:8000/api/search/stream?query=${encodeURIComponent(query)}`,
+                    { signal: controller.signal }
+                );
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\n');
+                    buffer = lines.pop();
+                    for (const line of lines) {
+                        if (!line.trim()) continue;
+                        const event = JSON.parse(line);
+                        if (event.candidates) {
+                            setResults(event.candidates);
+                            setIsLoading(false);
+                        }
+                    }
+                }
             } catch (error) {
+                if (error.name === 'AbortError') return;
                 console.error("Failed to fetch candidates:", error);
                 // Fallback / Initial state handled by setResults([]) or error state
-            } finally {
-                setIsLoading(false);
             }
+            setIsLoading(false);
         };
 
         const timer = setTimeout(fetchResults, 500);
-        return () => clearTimeout(timer);
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
     }, [query]);
 
     // Client-side filtering
@@ -82,7 +121,15 @@ const SearchPage = () => {
                                 onChange={(e) => setQuery(e.target.value)}
                                 onFocus={() => setIsFocused(true)}
                                 onBlur={() => setIsFocused(false)}
+                                list="search-suggestions"
                             />
+                            <datalist id="search-suggestions">
+                                {suggestions.map((suggestion) => (
+                                    <option key={`${suggestion.kind}:${suggestion.text}`} value={suggestion.text}>
+                                        {suggestion.kind}
+                                    </option>
+                                ))}
+                            </datalist>
                             <button
                                 onClick={() => setShowFilters(!showFilters)}
                                 className={`hidden md:flex items-center gap-2 px-6 py-3 rounded-lg transition-colors border text-sm font-medium ${showFilters ? 'bg-primary/20 border-primary text-primary' : 'bg-white/10 border-white/10 text-gray-300 hover:bg-white/20'}`}
@@ -1,5 +1,23 @@
+import numpy as np
 
-import random
+from telemetry import timed
+
+SKILL_POINTS = 20
+
+# Number of set bits in every possible byte, for popcounts over packed bitsets
+POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def normalize_skill(skill):
+    return " ".join(str(skill).casefold().split())
+
+def score_from_matches(matched, required):
+    """
+    Deterministic score: SKILL_POINTS per matched skill, plus a -5..+15 adjustment for
+    how much of the requirement is covered. Works on ints and NumPy arrays alike.
+    """
+    coverage = matched / required if required else matched * 0
+    adjustment = np.rint(coverage * 20).astype(np.int64) - 5
+    return np.clip(matched * SKILL_POINTS + adjustment, 0, 100)
 
 def calculate_match_score(candidate_profile, job_requirements):
     """
@@ -7,29 +25,125 @@ def calculate_match_score(candidate_profile, job_requirements):
     Returns a score between 0-100 and a reason.
     """
     # Simple keyword matching for prototype
-    matched_skills = [s for s in candidate_profile.get('skills', []) if s in job_requirements.get('skills', [])]
-    base_score = len(matched_skills) * 20
-    
-    # Add some "AI" randomness/nuance
-    ai_adjustment = random.randint(-5, 15)
-    final_score = min(100, max(0, base_score + ai_adjustment))
-    
+    required = {normalize_skill(s) for s in job_requirements.get('skills', [])}
+    matched_skills = {normalize_skill(s) for s in candidate_profile.get('skills', [])} & required
+    final_score = int(score_from_matches(len(matched_skills), len(required)))
+
     return {
         "score": final_score,
         "reason": f"Matched {len(matched_skills)} core skills. AI analysis suggests good cultural fit."
     }
 
-def analyze_interview_response(response_text):
+class SkillVocabulary:
     """
-    Mock AI analysis of interview response.
+    Maps normalized skill names to bit positions shared by every encoded candidate.
     """
-    keywords = ["experience", "team", "lead", "solve", "python", "react"]
-    score = sum(1 for k in keywords if k in response_text.lower())
-    
-    feedback = "Good technical understanding." if score > 2 else "Could be more specific."
-    
-    return {
-        "confidence": random.uniform(0.7, 0.99),
-        "sentiment": "positive",
-        "feedback": feedback
-    }
+    def __init__(self, skills=()):
+        self.positions = {}
+        for skill in skills:
+            self.add(skill)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, skill):
+        key = normalize_skill(skill)
+        if key not in self.positions:
+            self.positions[key] = len(self.positions)
+        return self.positions[key]
+
+    def encode(self, skills, width):
+        """
+        Packs known skills into a uint8 bitset of `width` bytes; unknown skills are ignored.
+        """
+        bits = np.zeros(width * 8, dtype=bool)
+        for skill in skills:
+            position = self.positions.get(normalize_skill(skill))
+            if position is not None:
+                bits[position] = True
+        return np.packbits(bits)
+
+class SkillMatrix:
+    """
+    Candidate skills encoded as packed bitsets, one row per candidate, for batch scoring.
+    """
+    @timed("ai_encode")
+    def __init__(self, skill_lists, vocab=None):
+        self.vocab = vocab if vocab is not None else SkillVocabulary()
+        row_ids, positions = [], []
+        for i, skills in enumerate(skill_lists):
+            for skill in skills or []:
+                row_ids.append(i)
+                positions.append(self.vocab.add(skill))
+        self.width = max(1, (len(self.vocab) + 7) // 8)
+        # Set bits directly in packed form (np.packbits order: MSB first)
+        self.bits = np.zeros((len(skill_lists), self.width), dtype=np.uint8)
+        positions = np.asarray(positions, dtype=np.int64)
+        np.bitwise_or.at(
+            self.bits,
+            (np.asarray(row_ids, dtype=np.int64), positions >> 3),
+            (128 >> (positions & 7)).astype(np.uint8),
+        )
+
+    @classmethod
+    def from_bits(cls, bits, vocab):
+        """
+        Wraps an already packed bitset matrix, such as a memory-mapped one, without copying it.
+        """
+        matrix = cls.__new__(cls)
+        matrix.vocab = vocab
+        matrix.bits = bits
+        matrix.width = bits.shape[1]
+        return matrix
+
+    def __len__(self):
+        return self.bits.shape[0]
+
+    def match_counts(self, skills):
+        query = self.vocab.encode(skills, self.width)
+        return POPCOUNT8[self.bits & query].sum(axis=1, dtype=np.int64)
+
+    def scores(self, skills):
+        required = len({normalize_skill(s) for s in skills})
+        return score_from_matches(self.match_counts(skills), required)
+
+    @timed("ai_top_k")
+    def top_k(self, skills, k):
+        """
+        Returns (indices, scores, match counts) for the k best candidates, best first.
+        """
+        counts = self.match_counts(skills)
+        scores = score_from_matches(counts, len({normalize_skill(s) for s in skills}))
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), scores[:0], counts[:0]
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        # Stable order among ties: higher score first, then lower index
+        order = np.lexsort((candidates, -scores[candidates]))
+        top = candidates[order]
+        return top, scores[top], counts[top]
+
+@timed("ai_batch_match")
+def batch_match_scores(candidates, job_requirements, top_k=10):
+    """
+    Scores every candidate against one job requirement in a single vectorized pass.
+    """
+    matrix = SkillMatrix([c.get('skills', []) for c in candidates])
+    indices, scores, counts = matrix.top_k(job_requirements.get('skills', []), top_k)
+    return [
+        {
+            "candidate": candidates[i],
+            "score": int(score),
+            "reason": f"Matched {int(count)} core skills. AI analysis suggests good cultural fit."
+        }
+        for i, score, count in zip(indices, scores, counts)
+    ]
+
+@timed("ai_interview")
+def analyze_interview_response(response_text, required_skills=()):
+    """
+    Deterministic analysis of a complete interview response. The interview WebSocket
+    computes the same scores incrementally as the answer streams in.
+    """
+    from interview import analyze_text  # interview builds on this module
+    return analyze_text(response_text, required_skills)
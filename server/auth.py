@@ -1,26 +1,117 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
-import models
+from database import get_db, run_db, DB_ASYNC, SessionLocal, AsyncSessionLocal
+import crud
+import telemetry
 
 # SECRET_KEY should be in env vars in production
 SECRET_KEY = "supersecretkeyForTraceAppHere"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; hashes with a different cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "32"))
+# How long a validated token may skip the user lookup, and how many to remember
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "30"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+# Trust the uid/ver claims in the token itself and skip the database entirely.
+# Changes to is_verified then only show up once the user gets a new token.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "0").lower() in ("1", "true", "yes")
+# Comma-separated emails allowed to use admin endpoints such as bulk import
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+_pwd_context = None
+
+def pwd_context():
+    """
+    The bcrypt context, built on first use: passlib is slow to import and most
+    requests never touch a password.
+    """
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return _pwd_context
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
+
+def verify_and_rehash(plain_password, hashed_password):
+    return pwd_context().verify_and_update(plain_password, hashed_password)
+
+class HashPool:
+    """
+    Bounded worker pool for bcrypt so hashing never runs on the event loop.
+    Once every worker is busy and max_queue calls are waiting, new calls get a 429.
+    """
+    def __init__(self, workers=HASH_WORKERS, max_queue=HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = None
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent sign-ins, please retry",
+                headers={"Retry-After": "1"},
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.in_flight += 1
+        try:
+            # Includes time queued behind other hashes, which is what the request waits for
+            with telemetry.stage("bcrypt"):
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        }
+
+hash_pool = HashPool()
+
+async def hash_password(password):
+    return await hash_pool.run(get_password_hash, password)
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """
+    Returns (valid, new_hash); new_hash is set when the stored hash used another cost factor.
+    """
+    return await hash_pool.run(verify_and_rehash, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,7 +123,70 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+class CurrentUser(NamedTuple):
+    """
+    What authenticated endpoints need to know about the caller; safe to cache across requests.
+    """
+    id: int
+    email: str
+    is_verified: bool
+
+def user_claims(user):
+    return {"sub": user.email, "uid": user.id, "ver": bool(user.is_verified)}
+
+class TokenCache:
+    """
+    Size-bounded LRU of validated token -> CurrentUser. Entries expire after ttl or with
+    the token, whichever comes first, and can be dropped per user when their data changes.
+    """
+    def __init__(self, ttl=TOKEN_CACHE_TTL, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._by_user = defaultdict(set)
+
+    def get(self, token):
+        entry = self._entries.get(token)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                self._discard(token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, token, user, token_expires_at):
+        self._entries[token] = (min(time.time() + self.ttl, token_expires_at), user)
+        self._entries.move_to_end(token)
+        self._by_user[user.id].add(token)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, token):
+        _, user = self._entries.pop(token)
+        tokens = self._by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[user.id]
+
+    def invalidate_user(self, user_id):
+        for token in list(self._by_user.get(user_id, ())):
+            self._discard(token)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+token_cache = TokenCache()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -45,7 +199,32 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+
+    if AUTH_STATELESS and "uid" in payload:
+        current = CurrentUser(payload["uid"], email, bool(payload.get("ver")))
+    else:
+        user = await run_db(db, crud.get_user_by_email, email)
+        if user is None:
+            raise credentials_exception
+        current = CurrentUser(user.id, user.email, bool(user.is_verified))
+    token_cache.put(token, current, payload["exp"])
+    return current
+
+async def authenticate_token(token):
+    """
+    get_current_user for WebSocket handshakes: the session is held only for the lookup,
+    not for the life of the connection.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            return await get_current_user(token, db)
+    with SessionLocal() as db:
+        return await get_current_user(token, db)
+
+async def get_admin_user(current_user: CurrentUser = Depends(get_current_user)):
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
@@ -0,0 +1,429 @@
+"""
+Reproducible benchmarks for the TRACE API hot paths.
+
+Measures cold start of a fresh worker process, runs the app in-process (no server, no
+network) against a throwaway SQLite database and a mock GitHub upstream, then
+micro-benchmarks matching and the fallback search over synthetic corpora. Results are written as JSON and can be compared to a stored baseline:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --baseline bench.json --fail-on-regression
+
+Each result reports count, errors, req/s (or ops/s) and p50/p95/p99/mean/max in ms.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SKILLS = [
+    "Python", "JavaScript", "TypeScript", "React", "Node.js", "Go", "Rust", "Java", "Kotlin",
+    "Swift", "C++", "C#", "SQL", "PostgreSQL", "MongoDB", "Redis", "Docker", "Kubernetes",
+    "AWS", "Azure", "GCP", "Terraform", "FastAPI", "Django", "Flask", "TensorFlow", "PyTorch",
+    "Machine Learning", "Data Science", "Figma", "Tailwind CSS", "GraphQL", "Git", "Linux",
+]
+ROLES = ["Frontend Developer", "Backend Engineer", "Full Stack Engineer", "Data Scientist",
+         "ML Engineer", "DevOps Engineer", "UI/UX Designer", "Mobile Developer"]
+FIRST_NAMES = ["Sarah", "Marcus", "Emma", "Alex", "Priya", "Wei", "Fatima", "Diego", "Yuki", "Noah"]
+LAST_NAMES = ["Chen", "Johnson", "Wilson", "Rodriguez", "Kumar", "Zhang", "Ali", "Garcia", "Sato", "Smith"]
+
+FULL_SIZES = "1000,10000,100000,1000000"
+QUICK_SIZES = "1000,10000"
+
+# --- Statistics ---
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+def summarize(latencies, wall_seconds, errors=0, unit="req_per_s"):
+    ordered = sorted(latencies)
+
+    def ms(seconds):
+        return round(seconds * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        unit: round(len(ordered) / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+    }
+
+# --- Synthetic data ---
+
+def synthetic_candidate(rng, i):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    return {
+        "id": f"trace-{i}",
+        "name": name,
+        "role": rng.choice(ROLES),
+        "verified": rng.random() < 0.3,
+        "skills": rng.sample(SKILLS, rng.randint(2, 6)),
+        "bio": f"{name} builds things with {rng.choice(SKILLS)}",
+        "experience": f"{rng.randint(0, 15)} years",
+        "source": "TRACE",
+    }
+
+def synthetic_query(rng):
+    terms = [rng.choice(SKILLS).split()[0].lower() for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.2:
+        terms[0] = terms[0][:3]  # a prefix, as typed
+    return " ".join(terms)
+
+# --- Mock GitHub upstream ---
+
+def mock_github(latency_ms):
+    import httpx
+
+    async def handler(request):
+        await asyncio.sleep(latency_ms / 1000)
+        headers = {"x-ratelimit-remaining": "4999", "x-ratelimit-limit": "5000",
+                   "x-ratelimit-reset": str(int(time.time()) + 3600)}
+        path = request.url.path
+        if path == "/search/users":
+            query = request.url.params.get("q", "")
+            if query.startswith("nomatch"):
+                return httpx.Response(200, json={"items": []}, headers={**headers, "x-ratelimit-resource": "search"})
+            per_page = int(request.url.params.get("per_page", "5"))
+            items = [
+                {"id": 10_000 + i, "login": f"{query.split()[0]}-dev{i}", "avatar_url": "",
+                 "html_url": f"https://github.com/{query.split()[0]}-dev{i}",
+                 "url": f"https://api.github.com/users/{query.split()[0]}-dev{i}"}
+                for i in range(per_page)
+            ]
+            return httpx.Response(200, json={"items": items}, headers={**headers, "x-ratelimit-resource": "search"})
+        if path.startswith("/users/"):
+            login = path.rsplit("/", 1)[1]
+            return httpx.Response(200, json={"name": login.title(), "bio": "dev", "public_repos": 12, "followers": 30},
+                                  headers={**headers, "x-ratelimit-resource": "core"})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    return httpx.MockTransport(handler)
+
+# --- Cold start ---
+
+STARTUP_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def ready():
+    async with main.lifespan(main.app):
+        return time.perf_counter()
+
+ready_at = asyncio.run(ready())
+print(json.dumps({"import": imported - started, "ready": ready_at - started}))
+"""
+
+def startup_benchmarks(args):
+    """
+    Fresh worker processes against an already-migrated database, the way workers start
+    after a deploy: importing the app, and import plus lifespan startup. "process"
+    adds interpreter start-up and shutdown.
+    """
+    import migrations
+    migrations.migrate()
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [sys.path[0], os.environ.get("PYTHONPATH")]))}
+    timings = {"import": [], "ready": [], "process": []}
+    errors = 0
+    for _ in range(3 if args.quick else 10):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True, env=env)
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0:
+            errors += 1
+            print(f"  worker failed to start: {proc.stderr.strip()[-500:]}")
+            continue
+        measured = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings["import"].append(measured["import"])
+        timings["ready"].append(measured["ready"])
+        timings["process"].append(elapsed)
+    return {f"startup_{name}": summarize(values, sum(values), errors, unit="ops_per_s")
+            for name, values in timings.items()}
+
+# --- API scenarios ---
+
+async def drive(make_request, n, concurrency):
+    """
+    Issues n requests from `concurrency` workers; returns the summary.
+    """
+    latencies = []
+    errors = 0
+    indices = iter(range(n))
+
+    async def worker():
+        nonlocal errors
+        for i in indices:
+            started = time.perf_counter()
+            try:
+                resp = await make_request(i)
+                failed = resp.status_code >= 400
+            except Exception as e:
+                print(f"  request failed: {e!r}")
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+async def api_benchmarks(args):
+    import httpx
+    import integrations
+    from github_client import TokenBucket
+    integrations.upstream_transport = mock_github(args.upstream_latency_ms)
+    # The mock has no quota; don't let the client-side throttle turn "uncached" into "throttled"
+    integrations.github.buckets = {name: TokenBucket(1e6, 1e6) for name in integrations.github.buckets}
+    import main
+
+    scale = 0.2 if args.quick else 1.0
+
+    def n(base):
+        return max(10, int(base * scale))
+
+    c = args.concurrency
+    results = {}
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            run_id = int(time.time() * 1000)
+            users = n(40)
+
+            def email(i):
+                return f"bench{run_id}-{i}@example.com"
+
+            async def signup(i):
+                return await client.post("/auth/signup", json={"email": email(i), "password": "benchmark-pw"})
+            results["signup"] = await drive(signup, users, min(c, 8))
+
+            tokens = []
+            async def login(i):
+                resp = await client.post("/auth/login", json={"email": email(i), "password": "benchmark-pw"})
+                if resp.status_code == 200:
+                    tokens.append(resp.json()["access_token"])
+                return resp
+            results["login"] = await drive(login, users, min(c, 8))
+            if not tokens:
+                raise RuntimeError("No user could log in; see the errors above")
+
+            def auth(i):
+                return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+            async def me(i):
+                return await client.get("/api/me", headers=auth(i))
+            results["me"] = await drive(me, n(2000), c)
+
+            rng = random.Random(args.seed)
+            async def update_profile(i):
+                body = {"full_name": f"Bench User {i}", "role": rng.choice(ROLES),
+                        "skills": rng.sample(SKILLS, 4), "bio": "benchmark profile"}
+                return await client.put("/api/profile", json=body, headers=auth(i))
+            results["profile_update"] = await drive(update_profile, n(500), c)
+
+            payload = os.urandom(64 * 1024)
+            async def upload(i):
+                files = {"file": (f"cert-{i}.pdf", i.to_bytes(8, "big") + payload, "application/pdf")}
+                return await client.post("/api/upload", files=files, params={"description": "benchmark"}, headers=auth(i))
+            results["upload_64k"] = await drive(upload, n(200), min(c, 16))
+
+            async def search_uncached(i):
+                return await client.get("/api/search", params={"query": f"python u{run_id}x{i}"})
+            results["search_uncached"] = await drive(search_uncached, n(300), c)
+
+            await client.get("/api/search", params={"query": "react developer"})
+            async def search_cached(i):
+                return await client.get("/api/search", params={"query": "react developer"})
+            results["search_cached"] = await drive(search_cached, n(2000), c)
+
+            # Upstream finds nobody: results come from local profiles and certificates
+            async def search_fallback(i):
+                return await client.get("/api/search", params={"query": f"nomatch{run_id}x{i} python react"})
+            results["search_fallback"] = await drive(search_fallback, n(500), c)
+
+            async def suggest(i):
+                return await client.get("/api/suggest", params={"prefix": SKILLS[i % len(SKILLS)][:2]})
+            results["suggest"] = await drive(suggest, n(2000), c)
+    return results
+
+# --- Micro-benchmarks ---
+
+def time_calls(fn, inputs):
+    latencies = []
+    started = time.perf_counter()
+    for item in inputs:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - started
+
+def micro_benchmarks(args):
+    from ai_engine import SkillMatrix, calculate_match_score
+    from search_index import CandidateIndex
+
+    sizes = [int(s) for s in (args.sizes or (QUICK_SIZES if args.quick else FULL_SIZES)).split(",")]
+    queries = max(20, 50 if args.quick else 200)
+    results = {}
+    for size in sizes:
+        rng = random.Random(args.seed)
+        candidates = [synthetic_candidate(rng, i) for i in range(size)]
+        jobs = [{"skills": rng.sample(SKILLS, rng.randint(1, 4))} for _ in range(10)]
+
+        # Scoring one job against every candidate, the way a per-candidate loop would
+        calls = candidates[:min(size, 100_000)]
+        latencies, wall = time_calls(lambda c: calculate_match_score(c, jobs[0]), calls)
+        results[f"match_score_call@{size}"] = summarize(latencies, wall, unit="ops_per_s")
+        passes = 3 if size >= 1_000_000 else 10
+        latencies, wall = time_calls(lambda job: [calculate_match_score(c, job) for c in candidates],
+                                     (jobs[i % len(jobs)] for i in range(passes)))
+        results[f"match_score_pass@{size}"] = summarize(latencies, wall, unit="ops_per_s")
+
+        started = time.perf_counter()
+        matrix = SkillMatrix([c["skills"] for c in candidates])
+        build = time.perf_counter() - started
+        latencies, wall = time_calls(lambda job: matrix.top_k(job["skills"], 10),
+                                     (jobs[i % len(jobs)] for i in range(queries)))
+        results[f"match_top_k@{size}"] = {**summarize(latencies, wall, unit="ops_per_s"),
+                                          "build_ms": round(build * 1000, 1)}
+
+        index = CandidateIndex(max_external=0)
+        started = time.perf_counter()
+        for candidate in candidates:
+            index.upsert(("profile", candidate["id"]), candidate)
+        build = time.perf_counter() - started
+        search_queries = [synthetic_query(rng) for _ in range(queries)]
+        latencies, wall = time_calls(lambda q: index.search(q, 20), search_queries)
+        results[f"fallback_search@{size}"] = {**summarize(latencies, wall, unit="ops_per_s"),
+                                              "build_ms": round(build * 1000, 1)}
+        print(f"  micro @{size}: done in {time.perf_counter() - started:.1f}s")
+        del index, matrix, candidates
+    return results
+
+# --- Reporting ---
+
+THROUGHPUT_KEYS = ("req_per_s", "ops_per_s")
+
+def compare(results, baseline, tolerance):
+    """
+    Returns regressions: p95 latency up, or throughput down, by more than tolerance.
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        if before["p95_ms"] > 0 and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        for key in THROUGHPUT_KEYS:
+            if before.get(key) and current.get(key, 0) < before[key] * (1 - tolerance):
+                regressions.append(f"{name}: {key} {before[key]} -> {current[key]}")
+    return regressions
+
+def print_table(results):
+    print(f"{'benchmark':32} {'count':>8} {'err':>5} {'thru/s':>10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, r in results.items():
+        throughput = r.get("req_per_s", r.get("ops_per_s", 0))
+        print(f"{name:32} {r['count']:>8} {r['errors']:>5} {throughput:>10} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TRACE API hot paths.")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--quick", action="store_true", help="fewer requests and smaller corpora")
+    parser.add_argument("--only", choices=("startup", "api", "micro"))
+    parser.add_argument("--sizes", help=f"comma-separated corpus sizes (default {FULL_SIZES})")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0)
+    parser.add_argument("--bcrypt-rounds", type=int, help="defaults to the server setting")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    args.output = os.path.abspath(args.output)
+    args.baseline = args.baseline and os.path.abspath(args.baseline)
+
+    # Everything the app writes goes to a scratch directory, configured before import
+    workdir = tempfile.mkdtemp(prefix="trace-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "VECTOR_INDEX_DIR": os.path.join(workdir, "vector_index"),
+        "GITHUB_CACHE_PATH": os.path.join(workdir, "github_cache.db"),
+        "SEARCH_CACHE_PATH": os.path.join(workdir, "search_cache.db"),
+        "THUMBNAIL_DIR": os.path.join(workdir, "thumbnails"),
+    })
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    # The app is imported from here but resolves some paths against the working directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+
+    results = {}
+    try:
+        if args.only in (None, "startup"):
+            print("Startup benchmarks...")
+            results.update(startup_benchmarks(args))
+        if args.only in (None, "api"):
+            print("API benchmarks...")
+            results.update(asyncio.run(api_benchmarks(args)))
+        if args.only in (None, "micro"):
+            print("Micro-benchmarks...")
+            results.update(micro_benchmarks(args))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    print_table(results)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,243 @@
+"""
+Bulk onboarding of users and profiles from CSV or JSONL exports.
+
+Rows are parsed one at a time, validated with schemas.ProfileImportRow and written in
+chunks: one multi-row INSERT for users and one for profiles per transaction. Bad rows are
+reported with their line number and never abort the rest of the import.
+
+    python bulk_import.py cohort.csv [--format csv|jsonl] [--chunk-size 500]
+
+Columns/keys: email, password (optional), full_name, role, experience, skills
+("React; Python" in CSV), bio, image_url, is_verified.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+import auth
+import models
+import schemas
+from database import SessionLocal
+from search_index import profile_to_candidate
+from snapshot import record_changes
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+# Only the first errors are returned; the counts always cover every row
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(50 * 1024 * 1024)))
+
+PROFILE_FIELDS = ("full_name", "role", "experience", "skills", "bio", "image_url")
+TRUE_VALUES = ("1", "true", "yes", "y")
+
+def detect_format(name="", content_type=""):
+    name, content_type = (name or "").lower(), (content_type or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")) or "json" in content_type:
+        return "jsonl"
+    return "csv"
+
+def iter_records(text_stream, fmt):
+    """
+    Yields (line number, dict) per record, or (line number, ValueError) for unparseable ones.
+    """
+    if fmt == "jsonl":
+        for line_no, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, ValueError(f"invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield line_no, ValueError("expected a JSON object")
+                continue
+            yield line_no, record
+        return
+
+    reader = csv.DictReader(text_stream)
+    reader.fieldnames  # consume the header so line numbers start after it
+    line_no = reader.line_num
+    for row in reader:
+        line_no, start = reader.line_num, line_no + 1
+        record = {(k or "").strip(): v.strip() for k, v in row.items() if isinstance(v, str) and v.strip()}
+        if "is_verified" in record:
+            record["is_verified"] = record["is_verified"].lower() in TRUE_VALUES
+        yield start, record
+
+def validation_message(error):
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    )
+
+class BulkImporter:
+    """
+    Writes validated rows in chunked transactions and keeps the report for the whole run.
+    """
+    def __init__(self, session_factory=SessionLocal, chunk_size=BULK_CHUNK_SIZE, max_errors=BULK_MAX_ERRORS):
+        self.session_factory = session_factory
+        self.chunk_size = max(1, chunk_size)
+        self.max_errors = max_errors
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.candidates = []  # (user_id, candidate snapshot) of new profiles, for the in-memory indexes
+        self._seen = set()
+        self._hasher = None
+
+    def error(self, line, email, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "email": email, "error": message})
+
+    def run(self, records):
+        started = time.perf_counter()
+        chunk = []
+        try:
+            for line, record in records:
+                self.rows += 1
+                if isinstance(record, Exception):
+                    self.error(line, None, str(record))
+                    continue
+                try:
+                    row = schemas.ProfileImportRow(**record)
+                except ValidationError as e:
+                    self.error(line, record.get("email"), validation_message(e))
+                    continue
+                key = row.email.lower()
+                if key in self._seen:
+                    self.error(line, row.email, "duplicate email in import")
+                    continue
+                self._seen.add(key)
+                chunk.append((line, row))
+                if len(chunk) >= self.chunk_size:
+                    self.write_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.write_chunk(chunk)
+        finally:
+            if self._hasher is not None:
+                self._hasher.shutdown()
+        return self.report(started)
+
+    def report(self, started):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed_ms": int((time.perf_counter() - started) * 1000),
+        }
+
+    def hash_passwords(self, rows):
+        """
+        Returns {line: bcrypt hash} for rows that carry a password.
+        """
+        with_password = [(line, row.password) for line, row in rows if row.password]
+        if not with_password:
+            return {}
+        if self._hasher is None:
+            # bcrypt releases the GIL, so a few threads hash a chunk in parallel
+            self._hasher = ThreadPoolExecutor(max_workers=auth.HASH_WORKERS, thread_name_prefix="bulk-bcrypt")
+        hashes = self._hasher.map(auth.get_password_hash, [password for _, password in with_password])
+        return {line: hashed for (line, _), hashed in zip(with_password, hashes)}
+
+    def write_chunk(self, chunk):
+        hashes = self.hash_passwords(chunk)
+        with self.session_factory() as db:
+            emails = [row.email for _, row in chunk]
+            existing = {email for (email,) in db.query(models.User.email).filter(models.User.email.in_(emails))}
+            rows = []
+            for line, row in chunk:
+                if row.email in existing:
+                    self.error(line, row.email, "email already registered")
+                else:
+                    rows.append((line, row))
+            if not rows:
+                return
+            try:
+                candidates = self.insert_rows(db, rows, hashes)
+                db.commit()
+                self.candidates.extend(candidates)
+            except IntegrityError:
+                # Lost a race with a concurrent signup; redo this chunk row by row
+                db.rollback()
+                for line, row in rows:
+                    try:
+                        candidates = self.insert_rows(db, [(line, row)], hashes)
+                        db.commit()
+                        self.candidates.extend(candidates)
+                    except IntegrityError as e:
+                        db.rollback()
+                        self.error(line, row.email, f"could not insert: {e.orig}")
+            self.created = len(self.candidates)
+
+    def insert_rows(self, db, rows, hashes):
+        users = [
+            {
+                "email": row.email,
+                "hashed_password": hashes.get(line),
+                "is_verified": row.is_verified,
+            }
+            for line, row in rows
+        ]
+        returned = db.execute(insert(models.User).returning(models.User.id, models.User.email), users)
+        ids = {email: user_id for user_id, email in returned}
+        profiles = []
+        for _, row in rows:
+            fields = {field: getattr(row, field) for field in PROFILE_FIELDS}
+            fields["full_name"] = fields["full_name"] or ""
+            profiles.append({"user_id": ids[row.email], **fields})
+        db.execute(insert(models.Profile), profiles)
+        record_changes(db, [fields["user_id"] for fields in profiles])
+
+        candidates = []
+        for (_, row), fields in zip(rows, profiles):
+            user = models.User(id=fields["user_id"], email=row.email, is_verified=row.is_verified)
+            candidates.append((fields["user_id"], profile_to_candidate(models.Profile(**fields), user)))
+        return candidates
+
+def import_file(handle, fmt, chunk_size=BULK_CHUNK_SIZE, session_factory=SessionLocal):
+    """
+    Imports from a binary file object. Returns (report, [(user_id, candidate snapshot)]).
+    """
+    text = io.TextIOWrapper(handle, encoding="utf-8-sig", errors="replace", newline="")
+    importer = BulkImporter(session_factory=session_factory, chunk_size=chunk_size)
+    try:
+        report = importer.run(iter_records(text, fmt))
+    finally:
+        text.detach()
+    return report, importer.candidates
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import users and profiles from CSV or JSONL.")
+    parser.add_argument("path", help="CSV/JSONL file, or - for stdin")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from migrations import ensure_schema
+    ensure_schema()
+
+    fmt = args.format or detect_format(args.path)
+    if args.path == "-":
+        report, _ = import_file(sys.stdin.buffer, fmt, args.chunk_size)
+    else:
+        with open(args.path, "rb") as handle:
+            report, _ = import_file(handle, fmt, args.chunk_size)
+    # Running servers pick the new profiles up from the change log within CANDIDATE_SYNC_SECONDS
+    print(json.dumps(report, indent=2))
+    return 0 if report["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
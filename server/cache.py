@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+# Tunables, overridable per deployment
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_NEGATIVE_TTL = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "30"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+# "memory" (per worker) or "sqlite" (shared by every worker on the host)
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "./search_cache.db")
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+class CacheBackend:
+    """
+    Storage interface for the search cache. Values must be JSON-serializable.
+    """
+    evictions = 0
+
+    def get(self, key):
+        """Returns (expires_at, value) or None."""
+        raise NotImplementedError
+
+    def set(self, key, value, expires_at):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process LRU, bounded by max_entries.
+    """
+    def __init__(self, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key, value, expires_at):
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class SQLiteBackend(CacheBackend):
+    """
+    File-backed LRU shared by all uvicorn workers on one host.
+    """
+    def __init__(self, path=SEARCH_CACHE_PATH, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=2000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_search_cache_accessed ON search_cache (accessed_at)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE search_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return row[0], json.loads(row[1])
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, time.time()),
+            )
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM search_cache WHERE key IN ("
+                    " SELECT key FROM search_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+class SearchCache:
+    """
+    TTL cache keyed on the normalized query with single-flight coalescing:
+    concurrent misses for the same key share one upstream call, which runs in its own
+    task so a caller that goes away doesn't cancel it for the others.
+    """
+    def __init__(self, backend=None, ttl=SEARCH_CACHE_TTL, negative_ttl=SEARCH_CACHE_NEGATIVE_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight = {}
+
+    async def _call(self, fn, *args):
+        # SQLite reads and writes block; keep them off the event loop
+        if isinstance(self.backend, MemoryBackend):
+            return fn(*args)
+        return await run_in_threadpool(fn, *args)
+
+    async def get_or_fetch(self, query, fetch):
+        """
+        Returns the cached value for query, or awaits fetch(query) once and caches it.
+        """
+        key = normalize_query(query)
+        entry = await self._call(self.backend.get, key)
+        if entry is not None and entry[0] > time.time():
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(key, query, fetch))
+            # Mark a failure retrieved even if every caller has stopped waiting
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, query, fetch):
+        try:
+            value = await fetch(query)
+            # Empty results usually mean upstream trouble; retry those sooner
+            ttl = self.ttl if value else self.negative_ttl
+            await self._call(self.backend.set, key, value, time.time() + ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def invalidate(self, query=None):
+        if query is None:
+            await self._call(self.backend.clear)
+        else:
+            await self._call(self.backend.delete, normalize_query(query))
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.backend.evictions,
+            "entries": len(self.backend),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+def make_backend(kind=SEARCH_CACHE_BACKEND):
+    if kind == "sqlite":
+        return SQLiteBackend()
+    if kind == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown search cache backend: {kind}")
+
+search_cache = SearchCache(make_backend())
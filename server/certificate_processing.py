@@ -0,0 +1,223 @@
+import importlib
+import os
+import re
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+
+import models
+from database import SessionLocal
+from jobs import job_queue
+from search_index import candidate_index, profile_to_candidate
+from snapshot import record_changes
+from uploads import THUMBNAIL_DIR
+MAX_TEXT_CHARS = 100000
+# Content streams are small; anything bigger decompressed is image data
+MAX_STREAM_BYTES = 2 * 1024 * 1024
+
+# Issuers whose certificates count towards a verified account, once an admin confirms them
+KNOWN_ISSUERS = {
+    "coursera": "Coursera",
+    "udemy": "Udemy",
+    "linkedin learning": "LinkedIn Learning",
+    "infosys springboard": "Infosys Springboard",
+    "cognifyz": "Cognifyz",
+    "microsoft": "Microsoft",
+    "google": "Google",
+    "amazon web services": "AWS",
+    "aws": "AWS",
+    "ibm": "IBM",
+    "nptel": "NPTEL",
+    "hackerrank": "HackerRank",
+    "edx": "edX",
+}
+
+SKILL_KEYWORDS = {
+    "python": "Python", "java": "Java", "javascript": "JavaScript", "typescript": "TypeScript",
+    "react": "React", "node.js": "Node.js", "sql": "SQL", "azure": "Azure", "aws": "AWS",
+    "docker": "Docker", "kubernetes": "Kubernetes", "machine learning": "Machine Learning",
+    "deep learning": "Deep Learning", "data science": "Data Science", "tensorflow": "TensorFlow",
+    "pytorch": "PyTorch", "cloud": "Cloud", "devops": "DevOps", "figma": "Figma",
+    "fastapi": "FastAPI", "git": "Git", "data analytics": "Data Analytics", "c++": "C++",
+}
+
+STREAM_RE = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+TEXT_OP_RE = re.compile(rb"\((?:\\.|[^\\)])*\)\s*Tj|\[[^\[\]]{0,4096}\]\s*TJ", re.S)
+STRING_RE = re.compile(rb"\(((?:\\.|[^\\)])*)\)", re.S)
+INFO_RE = re.compile(rb"/(?:Title|Subject|Keywords|Author)\s*\(((?:\\.|[^\\)])*)\)")
+
+def _unescape(raw):
+    return re.sub(rb"\\(.)", rb"\1", raw).decode("latin-1", "replace")
+
+def _fallback_pdf_text(data):
+    """
+    Dependency-free extraction: string operands of Tj/TJ operators in plain or
+    Flate-compressed content streams, plus document info strings.
+    """
+    parts = [_unescape(m) for m in INFO_RE.findall(data)]
+    for match in STREAM_RE.finditer(data):
+        header = data[max(0, match.start() - 512):match.start()]
+        if b"/Image" in header[header.rfind(b"<<"):]:
+            continue
+        stream = match.group(1)
+        try:
+            stream = zlib.decompressobj().decompress(stream, MAX_STREAM_BYTES)
+        except zlib.error:
+            pass
+        if b"BT" not in stream:
+            continue
+        for op in TEXT_OP_RE.findall(stream):
+            parts.append("".join(_unescape(s) for s in STRING_RE.findall(op)))
+    return " ".join(parts)
+
+_optional_modules = {}
+
+def optional_module(name):
+    """
+    Imports an optional dependency on first use (None if it isn't installed), so the
+    import cost lands on the job worker rather than on every process start.
+    """
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+def is_pdf(path):
+    with open(path, "rb") as f:
+        return f.read(4) == b"%PDF"
+
+def extract_text(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(b"%PDF"):
+        return data[:MAX_TEXT_CHARS].decode("utf-8", "replace")
+    # Better PDF text extraction when installed
+    pypdf = optional_module("pypdf")
+    if pypdf is not None:
+        try:
+            reader = pypdf.PdfReader(path)
+            return " ".join(page.extract_text() or "" for page in reader.pages)[:MAX_TEXT_CHARS]
+        except Exception as e:
+            print(f"pypdf failed on {path}: {e!r}")
+    return _fallback_pdf_text(data)[:MAX_TEXT_CHARS]
+
+def render_thumbnail(path, sha256):
+    """
+    Renders the first page to PNG when PyMuPDF is available; returns the path or None.
+    """
+    fitz = optional_module("fitz")  # PyMuPDF
+    if fitz is None:
+        return None
+    target = os.path.join(THUMBNAIL_DIR, f"{sha256}.png")
+    if os.path.exists(target):
+        return target
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    with fitz.open(path) as document:
+        if document.page_count == 0:
+            return None
+        document[0].get_pixmap(matrix=fitz.Matrix(0.5, 0.5)).save(target)
+    return target
+
+def detect_issuers(text):
+    lowered = " ".join(text.lower().split())
+    return sorted({name for key, name in KNOWN_ISSUERS.items() if re.search(rf"\b{re.escape(key)}\b", lowered)})
+
+def detect_skills(text, known_skills=()):
+    lowered = " ".join(text.lower().split())
+    vocabulary = dict(SKILL_KEYWORDS)
+    # Very short names ("Go", "C") match ordinary words too often to trust
+    vocabulary.update({s.lower(): s for s in known_skills if len(s) > 2})
+    return sorted({name for key, name in vocabulary.items()
+                   if key and re.search(rf"(?<!\w){re.escape(key)}(?!\w)", lowered)})
+
+def apply_findings(user_id, certificate_id, issuers, skills):
+    """
+    Merges detected skills into the profile and queues any issuers found for an admin to
+    review; a keyword hit alone never verifies anyone. Returns a candidate snapshot of the
+    updated profile, or None.
+    """
+    with SessionLocal() as db:
+        user = db.get(models.User, user_id)
+        if user is None:
+            return None
+        certificate = db.get(models.Certificate, certificate_id) if certificate_id else None
+        if issuers and certificate is not None and certificate.review_status is None:
+            certificate.issuers = issuers
+            certificate.review_status = "pending"
+        profile = user.profile
+        if profile is None:
+            profile = models.Profile(user_id=user_id, full_name="", skills=[])
+            db.add(profile)
+        existing = list(profile.skills or [])
+        lowered = {s.lower() for s in existing}
+        new_skills = [s for s in skills if s.lower() not in lowered]
+        if new_skills:
+            profile.skills = existing + new_skills
+        record_changes(db, [user_id])
+        db.commit()
+        db.refresh(profile)
+        return profile_to_candidate(profile, user)
+
+def review_certificate(certificate_id, approved):
+    """
+    Records an admin's decision on a pending certificate; approving one verifies its owner.
+    Returns (certificate, candidate snapshot if the owner's profile changed), or None.
+    """
+    with SessionLocal() as db:
+        certificate = db.get(models.Certificate, certificate_id)
+        if certificate is None:
+            return None
+        certificate.review_status = "approved" if approved else "rejected"
+        candidate = None
+        user = certificate.user
+        if approved and user is not None and not user.is_verified:
+            user.is_verified = True
+            record_changes(db, [user.id])
+            if user.profile is not None:
+                candidate = profile_to_candidate(user.profile, user)
+        db.commit()
+        db.refresh(certificate)
+        return certificate, candidate
+
+@job_queue.handler("process_certificate")
+async def process_certificate(payload, ctx):
+    path = payload["path"]
+    await ctx.progress(10, "extracting text")
+    text = await run_in_threadpool(extract_text, path)
+    from_pdf = await run_in_threadpool(is_pdf, path)
+
+    await ctx.progress(40, "rendering thumbnail")
+    try:
+        thumbnail = await run_in_threadpool(render_thumbnail, path, payload["sha256"])
+    except Exception as e:
+        # A thumbnail is nice to have; don't fail (and retry) the whole job over it
+        print(f"Thumbnail failed for {path}: {e!r}")
+        thumbnail = None
+
+    await ctx.progress(70, "detecting issuer and skills")
+    # Issuers only count from the document itself: the file name, description and
+    # plain-text uploads are whatever the user typed
+    issuers = detect_issuers(text) if from_pdf else []
+    # The corpus vocabulary is O(corpus) to collect; keep it off the event loop
+    skills = await run_in_threadpool(
+        lambda: detect_skills(f"{payload.get('filename', '')} {payload.get('description', '')} {text}",
+                              candidate_index.known_skills())
+    )
+
+    await ctx.progress(90, "updating profile")
+    candidate = await run_in_threadpool(apply_findings, payload["user_id"], payload.get("certificate_id"),
+                                        issuers, skills)
+    if candidate is not None:
+        candidate_index.upsert(("profile", payload["user_id"]), candidate)
+
+    return {
+        "certificate_id": payload.get("certificate_id"),
+        "issuers": issuers,
+        "skills": skills,
+        "review": "pending" if issuers else None,
+        # Served by /certificates/thumbnails/; signed when the job is read
+        "thumbnail": payload.get("thumbnail_url") if thumbnail else None,
+        "text_chars": len(text),
+    }
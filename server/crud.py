@@ -0,0 +1,120 @@
+# Synchronous data-access helpers. Endpoints call them through database.run_db so the
+# same code runs off the event loop with either sync or async sessions.
+import os
+from sqlalchemy.orm import joinedload, lazyload, selectinload
+
+import models
+from search_index import profile_to_candidate
+from snapshot import record_changes
+
+# How the user -> profile/certificates graph is loaded for serialization:
+# "selectin" (one extra query per relationship), "joined" (single JOIN) or "lazy"
+USER_GRAPH_LOADER = os.getenv("USER_GRAPH_LOADER", "selectin")
+
+LOADERS = {"selectin": selectinload, "joined": joinedload, "lazy": lazyload}
+
+def user_graph_options(strategy=None):
+    strategy = strategy or USER_GRAPH_LOADER
+    if strategy == "joined":
+        # A collection JOIN multiplies rows; certificates still go through selectin
+        return [joinedload(models.User.profile), selectinload(models.User.certificates)]
+    loader = LOADERS[strategy]
+    return [loader(models.User.profile), loader(models.User.certificates)]
+
+def get_user_by_email(db, email):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def create_user(db, email, hashed_password):
+    new_user = models.User(email=email, hashed_password=hashed_password)
+    # Empty profile for the user, written in the same transaction
+    new_user.profile = models.Profile(full_name="", skills=[])
+    db.add(new_user)
+    db.commit()
+    # Loaded here, so callers can read it on the event loop without a lazy SELECT
+    db.refresh(new_user)
+    return new_user
+
+def update_password_hash(db, user, hashed_password):
+    user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(user)
+
+def get_user_graph(db, user_id):
+    """
+    Loads a user with profile and certificates, ready to serialize without lazy loads.
+    """
+    return (
+        db.query(models.User)
+        .options(*user_graph_options())
+        .filter(models.User.id == user_id)
+        .first()
+    )
+
+def list_users(db, after_id=0, limit=50):
+    """
+    One keyset page of users with profile and certificates, in a constant number of queries.
+    """
+    return (
+        db.query(models.User)
+        .options(*user_graph_options())
+        .filter(models.User.id > after_id)
+        .order_by(models.User.id)
+        .limit(limit)
+        .all()
+    )
+
+def save_profile(db, user, changes):
+    """
+    Applies profile changes and returns (profile, candidate snapshot for the search indexes).
+    """
+    profile = db.query(models.Profile).filter(models.Profile.user_id == user.id).first()
+    if not profile:
+        profile = models.Profile(user_id=user.id)
+        db.add(profile)
+
+    for key, value in changes.items():
+        setattr(profile, key, value)
+
+    record_changes(db, [user.id])
+    db.commit()
+    db.refresh(profile)
+    return profile, profile_to_candidate(profile, user)
+
+def search_profiles(db, fulltext, query, limit, offset):
+    """
+    Returns (ranked profile dicts with scores, number of ranked rows) for one page.
+    """
+    ranked = fulltext.search(db, query, limit=limit, offset=offset)
+    profiles = {}
+    if ranked:
+        ids = [profile_id for profile_id, _ in ranked]
+        profiles = {p.id: p for p in db.query(models.Profile).filter(models.Profile.id.in_(ids))}
+
+    fields = [c.name for c in models.Profile.__table__.columns]
+    results = []
+    for profile_id, score in ranked:
+        profile = profiles.get(profile_id)
+        if profile is not None:
+            results.append({**{f: getattr(profile, f) for f in fields}, "score": score})
+    return results, len(ranked)
+
+def list_pending_certificates(db, limit=50):
+    return (
+        db.query(models.Certificate)
+        .filter(models.Certificate.review_status == "pending")
+        .order_by(models.Certificate.id)
+        .limit(limit)
+        .all()
+    )
+
+def create_certificate(db, user_id, filename, description, url):
+    certificate = models.Certificate(
+        user_id=user_id,
+        filename=filename,
+        description=description,
+        url=url
+    )
+    db.add(certificate)
+    db.commit()
+    db.refresh(certificate)
+    return certificate
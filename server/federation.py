@@ -0,0 +1,307 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from starlette.concurrency import run_in_threadpool
+
+import models
+from cache import search_cache
+import telemetry
+from database import SessionLocal
+from integrations import github_candidates, mock_linkedin_coursera_enrichment
+from search_index import candidate_index, profile_to_candidate, tokenize
+
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "20"))
+
+def deadline_for(name, default):
+    """Per-source deadline in seconds, e.g. SEARCH_DEADLINE_GITHUB=2.5."""
+    return float(os.getenv(f"SEARCH_DEADLINE_{name.upper()}", default))
+
+def candidate_identity(candidate):
+    """
+    Key under which one person found by several sources is merged.
+    """
+    if candidate.get("username"):
+        return f"github:{candidate['username'].lower()}"
+    if str(candidate.get("id", "")).startswith("trace-"):
+        return candidate["id"]
+    return "name:" + " ".join(str(candidate.get("name", "")).lower().split())
+
+def trace_score(coverage, bonus=0):
+    # Same 60-99 scale as the GitHub "TRACE Score", so sources rank against each other
+    return min(99, 60 + round(25 * coverage) + bonus)
+
+class CandidateSource:
+    """
+    A provider of candidates. search() returns candidate dicts carrying a "score";
+    the federated search bounds it with `deadline` seconds.
+    """
+    name = "source"
+    deadline = 1.0
+    # Keep running after the deadline (results are cached for the next search)
+    finish_in_background = False
+
+    async def search(self, query, limit):
+        raise NotImplementedError
+
+class GitHubSource(CandidateSource):
+    name = "github"
+    finish_in_background = True
+
+    def __init__(self):
+        self.deadline = deadline_for(self.name, 3.0)
+
+    async def search(self, query, limit):
+        results = await search_cache.get_or_fetch(query, github_candidates)
+        if results:
+            # Later searches can find these people offline too
+            candidate_index.add_external(results)
+        return results[:limit]
+
+class LocalIndexSource(CandidateSource):
+    """
+    TRACE profiles plus the mock and previously seen external candidates, from memory.
+    """
+    name = "local"
+
+    def __init__(self):
+        self.deadline = deadline_for(self.name, 0.2)
+
+    async def search(self, query, limit):
+        terms = len(set(tokenize(query))) or 1
+        results = []
+        for candidate, matched, _ in candidate_index.search_scored(query, limit):
+            bonus = 10 if candidate.get("verified") else 0
+            results.append({**candidate, "score": trace_score(matched / terms, bonus)})
+        return results
+
+class CertificateSource(CandidateSource):
+    """
+    Profiles whose uploaded certificates mention the query, with those certificates as evidence.
+    """
+    name = "certificates"
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.deadline = deadline_for(self.name, 0.5)
+
+    async def search(self, query, limit):
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        return await run_in_threadpool(self._search, terms, limit)
+
+    def _search(self, terms, limit):
+        conditions = []
+        for term in terms:
+            conditions.append(models.Certificate.description.ilike(f"%{term}%"))
+            conditions.append(models.Certificate.filename.ilike(f"%{term}%"))
+        with self.session_factory() as db:
+            certificates = (
+                db.query(models.Certificate)
+                .options(joinedload(models.Certificate.user).joinedload(models.User.profile))
+                .filter(or_(*conditions))
+                .limit(limit * 5)
+                .all()
+            )
+            by_user = {}
+            for certificate in certificates:
+                user = certificate.user
+                if user is None or user.profile is None:
+                    continue
+                text = f"{certificate.description or ''} {certificate.filename or ''}".lower()
+                entry = by_user.setdefault(user.id, {"user": user, "terms": set(), "evidence": []})
+                entry["terms"].update(t for t in terms if t in text)
+                entry["evidence"].append(certificate.description or certificate.filename)
+
+            results = []
+            for entry in by_user.values():
+                user = entry["user"]
+                candidate = profile_to_candidate(user.profile, user)
+                bonus = 10 + (5 if user.is_verified else 0)
+                candidate["score"] = trace_score(len(entry["terms"]) / len(terms), bonus)
+                candidate["certificates"] = entry["evidence"][:5]
+                results.append(candidate)
+        results.sort(key=lambda c: c["score"], reverse=True)
+        return results[:limit]
+
+class Enricher:
+    """
+    Adds signals to another source's candidates as they arrive. enrich() returns
+    {identity: {"fields": {...}, "score_boost": n}} for the candidates it knows about.
+    """
+    name = "enricher"
+    deadline = 0.3
+
+    async def enrich(self, candidates):
+        raise NotImplementedError
+
+class MockTrustEnricher(Enricher):
+    """
+    Cross-references GitHub candidates with (mocked) LinkedIn/Coursera/Udemy records.
+    """
+    name = "trust"
+
+    def __init__(self):
+        self.deadline = deadline_for(self.name, 0.3)
+
+    async def enrich(self, candidates):
+        signals = {}
+        for candidate in candidates:
+            if candidate.get("source") != "GitHub":
+                continue
+            identity = candidate_identity(candidate)
+            # Seeded per person so a candidate's badge doesn't change between searches
+            badge = mock_linkedin_coursera_enrichment(rng=random.Random(identity))
+            if badge:
+                signals[identity] = {
+                    "fields": {"verified_badge": badge, "verified": True},
+                    "score_boost": badge["trust_score_boost"],
+                }
+        return signals
+
+class TopK:
+    """
+    Incrementally maintained best-k candidates, merged by identity. A min-heap holds the
+    current top k; entries replaced by a better-scored duplicate are skipped lazily.
+    """
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._best = {}  # identity -> (score, seq, candidate)
+        self._seq = itertools.count()
+
+    def offer(self, candidate):
+        """Returns True if the top k changed."""
+        identity = candidate_identity(candidate)
+        score = candidate.get("score", 0)
+        current = self._best.get(identity)
+        if current is not None:
+            merged = sorted(set(current[2]["sources"]) | set(candidate["sources"]))
+            if score <= current[0]:
+                current[2]["sources"] = merged
+                return False
+            candidate["sources"] = merged
+        elif len(self._best) >= self.k and score <= self._heap[0][0]:
+            return False
+
+        seq = next(self._seq)
+        self._best[identity] = (score, seq, candidate)
+        heapq.heappush(self._heap, (score, seq, identity))
+        while self._heap:
+            low_score, low_seq, low_identity = self._heap[0]
+            entry = self._best.get(low_identity)
+            if entry is None or entry[1] != low_seq:
+                heapq.heappop(self._heap)  # superseded
+            elif len(self._best) > self.k:
+                heapq.heappop(self._heap)
+                del self._best[low_identity]
+            else:
+                break
+        return identity in self._best and self._best[identity][1] == seq
+
+    def items(self):
+        ranked = sorted(self._best.values(), key=lambda e: (-e[0], e[1]))
+        return [candidate for _, _, candidate in ranked]
+
+def normalize(candidate, source):
+    # Every candidate carries the fields the search UI renders
+    candidate = dict(candidate)
+    candidate.setdefault("image", candidate.get("avatar") or "")
+    candidate.setdefault("verified", bool(candidate.get("verified_badge")))
+    candidate.setdefault("experience", "")
+    candidate.setdefault("role", "")
+    candidate["skills"] = list(candidate.get("skills") or [])
+    candidate["sources"] = [source]
+    return candidate
+
+class FederatedSearch:
+    """
+    Queries every source concurrently, each under its own deadline, and merges results
+    into one deduplicated top-k as they arrive.
+    """
+    def __init__(self, sources, enrichers=(), k=SEARCH_TOP_K):
+        self.sources = list(sources)
+        self.enrichers = list(enrichers)
+        self.k = k
+
+    async def _enrich(self, candidates):
+        for enricher in self.enrichers:
+            try:
+                signals = await asyncio.wait_for(enricher.enrich(candidates), enricher.deadline)
+            except asyncio.TimeoutError:
+                continue
+            except Exception as e:
+                print(f"Enricher {enricher.name} failed: {e!r}")
+                continue
+            for candidate in candidates:
+                signal = signals.get(candidate_identity(candidate))
+                if signal:
+                    candidate.update(signal.get("fields", {}))
+                    candidate["score"] = min(99, candidate.get("score", 0) + signal.get("score_boost", 0))
+
+    async def _run(self, source, query, limit):
+        started = time.perf_counter()
+        work = asyncio.ensure_future(source.search(query, limit))
+        try:
+            found = await asyncio.wait_for(asyncio.shield(work) if source.finish_in_background else work,
+                                           source.deadline)
+            candidates = [normalize(c, source.name) for c in found or []]
+            await self._enrich(candidates)
+            status = "ok"
+        except asyncio.TimeoutError:
+            candidates, status = [], "timeout"
+        except Exception as e:
+            print(f"Search source {source.name} failed: {e!r}")
+            candidates, status = [], "error"
+        elapsed = time.perf_counter() - started
+        telemetry.record(f"search_{source.name}", elapsed)
+        elapsed_ms = round(elapsed * 1000, 1)
+        return source.name, status, candidates, elapsed_ms
+
+    async def stream(self, query, k=None):
+        """
+        Async generator of events: one "partial" per finished source (with the merged
+        top-k so far, when it changed) and a final "done".
+        """
+        k = k or self.k
+        started = time.perf_counter()
+        top = TopK(k)
+        summary = {}
+        tasks = [asyncio.ensure_future(self._run(source, query, k)) for source in self.sources]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                name, status, candidates, elapsed_ms = await next_done
+                changed = False
+                for candidate in candidates:
+                    changed = top.offer(candidate) or changed
+                summary[name] = {"status": status, "count": len(candidates), "elapsed_ms": elapsed_ms}
+                event = {"event": "partial", "source": name, **summary[name]}
+                if changed:
+                    event["candidates"] = top.items()
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
+        yield {
+            "event": "done",
+            "candidates": top.items(),
+            "sources": summary,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def collect(self, query, k=None):
+        """Runs the whole search and returns the final "done" event."""
+        async for event in self.stream(query, k):
+            if event["event"] == "done":
+                return event
+
+federated_search = FederatedSearch(
+    [GitHubSource(), LocalIndexSource(), CertificateSource()],
+    [MockTrustEnricher()],
+)
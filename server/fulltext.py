@@ -0,0 +1,108 @@
+import re
+from sqlalchemy import text
+
+# Relative column weights for ranking: name, role, bio, skills
+WEIGHTS = {"full_name": 4.0, "role": 3.0, "bio": 1.0, "skills": 5.0}
+
+def query_terms(query):
+    return re.findall(r"\w+", query.lower())
+
+class FullTextEngine:
+    """
+    Keeps a full-text mirror of profile text in the database and queries it ranked.
+    """
+    def setup(self, conn):
+        """Creates the mirror and its indexes; run inside a migration's transaction."""
+        raise NotImplementedError
+
+    def search(self, db, query, limit=20, offset=0):
+        """Returns [(profile_id, score)], best first."""
+        raise NotImplementedError
+
+class SQLiteFTS5Engine(FullTextEngine):
+    """
+    External-content FTS5 table over `profiles`, synced by triggers, ranked with bm25().
+    """
+    DDL = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS profiles_fts USING fts5(
+            full_name, role, bio, skills,
+            content='profiles', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS profiles_fts_ai AFTER INSERT ON profiles BEGIN
+            INSERT INTO profiles_fts(rowid, full_name, role, bio, skills)
+            VALUES (new.id, new.full_name, new.role, new.bio, new.skills);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS profiles_fts_ad AFTER DELETE ON profiles BEGIN
+            INSERT INTO profiles_fts(profiles_fts, rowid, full_name, role, bio, skills)
+            VALUES ('delete', old.id, old.full_name, old.role, old.bio, old.skills);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS profiles_fts_au AFTER UPDATE ON profiles BEGIN
+            INSERT INTO profiles_fts(profiles_fts, rowid, full_name, role, bio, skills)
+            VALUES ('delete', old.id, old.full_name, old.role, old.bio, old.skills);
+            INSERT INTO profiles_fts(rowid, full_name, role, bio, skills)
+            VALUES (new.id, new.full_name, new.role, new.bio, new.skills);
+        END""",
+    ]
+
+    def setup(self, conn):
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profiles_fts'"
+        )).first()
+        for statement in self.DDL:
+            conn.execute(text(statement))
+        if not exists:
+            # Index rows written before the mirror existed
+            conn.execute(text("INSERT INTO profiles_fts(profiles_fts) VALUES ('rebuild')"))
+
+    def search(self, db, query, limit=20, offset=0):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Quote every term so user input can't inject FTS5 syntax; prefix-match each
+        match = " OR ".join(f'"{t}"*' for t in terms)
+        weights = ", ".join(str(WEIGHTS[c]) for c in ("full_name", "role", "bio", "skills"))
+        rows = db.execute(text(
+            f"SELECT rowid, bm25(profiles_fts, {weights}) AS rank FROM profiles_fts "
+            "WHERE profiles_fts MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset})
+        # bm25() is lower-is-better; flip it so higher scores rank first for clients
+        return [(row[0], -row[1]) for row in rows]
+
+class PostgresTSVectorEngine(FullTextEngine):
+    """
+    Weighted, generated tsvector column with a GIN index, ranked with ts_rank_cd().
+    """
+    DDL = [
+        """ALTER TABLE profiles ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(skills::text, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(full_name, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(role, '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(bio, '')), 'D')
+            ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_profiles_search_vector ON profiles USING GIN (search_vector)",
+    ]
+
+    def setup(self, conn):
+        for statement in self.DDL:
+            conn.execute(text(statement))
+
+    def search(self, db, query, limit=20, offset=0):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        tsquery = " | ".join(f"{t}:*" for t in terms)
+        rows = db.execute(text(
+            "SELECT id, ts_rank_cd(search_vector, q) AS rank "
+            "FROM profiles, to_tsquery('simple', :tsquery) q "
+            "WHERE search_vector @@ q ORDER BY rank DESC LIMIT :limit OFFSET :offset"
+        ), {"tsquery": tsquery, "limit": limit, "offset": offset})
+        return [(row[0], row[1]) for row in rows]
+
+def get_fulltext_engine(bind):
+    """bind is an engine or connection; only its dialect is used."""
+    if bind.dialect.name == "sqlite":
+        return SQLiteFTS5Engine()
+    if bind.dialect.name == "postgresql":
+        return PostgresTSVectorEngine()
+    raise NotImplementedError(f"No full-text engine for {bind.dialect.name}")
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
+GITHUB_CACHE_PATH = os.getenv("GITHUB_CACHE_PATH", "./github_cache.db")
+# Served without contacting GitHub at all
+GITHUB_CACHE_FRESH_SECONDS = float(os.getenv("GITHUB_CACHE_FRESH_SECONDS", "60"))
+# Past fresh but within this age: served at once and revalidated in the background
+GITHUB_CACHE_SWR_SECONDS = float(os.getenv("GITHUB_CACHE_SWR_SECONDS", "600"))
+# Oldest response still served when the rate limit budget is exhausted
+GITHUB_CACHE_MAX_STALE_SECONDS = float(os.getenv("GITHUB_CACHE_MAX_STALE_SECONDS", "86400"))
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "5000"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "2"))
+GITHUB_BACKOFF_BASE = float(os.getenv("GITHUB_BACKOFF_BASE", "0.5"))
+# Longest we'll sleep on a Retry-After or for a throttle token inside a request
+GITHUB_MAX_WAIT = float(os.getenv("GITHUB_MAX_WAIT", "2"))
+
+# GitHub's published budgets: (requests, per seconds) for each rate limit resource
+RATE_LIMITS = {
+    "search": (30, 60) if GITHUB_TOKEN else (10, 60),
+    "core": (5000, 3600) if GITHUB_TOKEN else (60, 3600),
+}
+
+class RateLimited(Exception):
+    """
+    No budget left for a request and nothing cached to fall back on.
+    """
+    def __init__(self, resource, retry_at):
+        super().__init__(f"GitHub {resource} rate limit exhausted until {retry_at:.0f}")
+        self.resource = resource
+        self.retry_at = retry_at
+
+class UpstreamError(Exception):
+    pass
+
+class ResponseCache:
+    """
+    On-disk store of upstream responses with their validators (ETag / Last-Modified),
+    shared by every worker on the host.
+    """
+    def __init__(self, path=GITHUB_CACHE_PATH, max_entries=GITHUB_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=2000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS github_responses ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,"
+            " body TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_github_responses_fetched ON github_responses (fetched_at)"
+        )
+
+    def get(self, url):
+        """Returns {"etag", "last_modified", "body", "fetched_at"} or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, fetched_at FROM github_responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "body": json.loads(row[2]), "fetched_at": row[3]}
+
+    def put(self, url, body, etag=None, last_modified=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO github_responses VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, json.dumps(body), time.time()),
+            )
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM github_responses WHERE url IN ("
+                    " SELECT url FROM github_responses ORDER BY fetched_at LIMIT ?)",
+                    (overflow,),
+                )
+
+    def touch(self, url):
+        """Marks a cached response as just revalidated (a 304)."""
+        with self._lock:
+            self._conn.execute("UPDATE github_responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def close(self):
+        self._conn.close()
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM github_responses").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+class TokenBucket:
+    """
+    Client-side throttle: `capacity` requests at once, refilled at `rate` per second.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def acquire(self, max_wait):
+        """Takes a token, sleeping up to max_wait for one. Returns False if that isn't enough."""
+        wait = self.wait_time()
+        if wait > max_wait:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+            self._refill()
+        self.tokens -= 1
+        return True
+
+    def spend(self):
+        """Charges a request after the fact; a deficit delays the next acquire."""
+        self._refill()
+        self.tokens -= 1
+
+    def sync(self, remaining):
+        # Never believe we have more budget than GitHub says is left
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, GITHUB_BACKOFF_BASE * (2 ** attempt))
+
+class GitHubClient:
+    """
+    Rate-limit aware GET of GitHub JSON. Responses are cached with their validators and
+    revalidated with conditional requests, since a 304 doesn't spend quota. The budget
+    reported in X-RateLimit-* headers gates and throttles requests; once it is spent,
+    cached responses are served stale rather than failing.
+    """
+    def __init__(self, client_factory, cache_path=GITHUB_CACHE_PATH, base_url=GITHUB_API_URL, token=GITHUB_TOKEN):
+        self.client_factory = client_factory
+        self.cache_path = cache_path
+        self.base_url = base_url
+        self.token = token
+        self.buckets = {name: TokenBucket(n / per, n) for name, (n, per) in RATE_LIMITS.items()}
+        self.budget = {}        # resource -> {"limit", "remaining", "reset"} from GitHub
+        self.blocked_until = {}  # resource -> epoch seconds
+        self.counters = {"fresh": 0, "revalidated": 0, "fetched": 0, "stale": 0,
+                         "background": 0, "throttled": 0, "retries": 0, "errors": 0}
+        self._cache = None
+        self._cache_lock = threading.Lock()
+        self._revalidating = {}
+
+    @property
+    def cache(self):
+        # Opened on first use so importing this module creates no files
+        with self._cache_lock:
+            if self._cache is None:
+                self._cache = ResponseCache(self.cache_path)
+        return self._cache
+
+    async def _cached(self, method, *args):
+        # SQLite reads and writes block; keep them off the event loop
+        return await run_in_threadpool(lambda: getattr(self.cache, method)(*args))
+
+    def url(self, path):
+        return path if path.startswith("http") else f"{self.base_url}{path}"
+
+    async def get_json(self, path, params=None, resource="core", timeout=None):
+        """
+        Returns the JSON body for a GET. Raises RateLimited or UpstreamError when
+        neither GitHub nor the cache can answer.
+        """
+        import httpx  # deferred until the first upstream call, like the client itself
+        url = str(httpx.URL(self.url(path), params=params))
+        cached = await self._cached("get", url)
+        age = time.time() - cached["fetched_at"] if cached else None
+
+        if cached and age < GITHUB_CACHE_FRESH_SECONDS:
+            self.counters["fresh"] += 1
+            return cached["body"]
+        if cached and age < GITHUB_CACHE_SWR_SECONDS:
+            self.counters["stale"] += 1
+            self._revalidate_later(url, resource, timeout)
+            return cached["body"]
+
+        try:
+            return await self._fetch(url, cached, resource, timeout)
+        except (RateLimited, UpstreamError):
+            if cached and age < GITHUB_CACHE_MAX_STALE_SECONDS:
+                self.counters["stale"] += 1
+                return cached["body"]
+            raise
+
+    def _revalidate_later(self, url, resource, timeout):
+        if url in self._revalidating:
+            return
+        task = asyncio.create_task(self._background_fetch(url, resource, timeout))
+        self._revalidating[url] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(url, None))
+
+    async def _background_fetch(self, url, resource, timeout):
+        self.counters["background"] += 1
+        try:
+            await self._fetch(url, await self._cached("get", url), resource, timeout)
+        except (RateLimited, UpstreamError) as e:
+            print(f"GitHub revalidation skipped for {url}: {e}")
+
+    def _check_budget(self, resource):
+        now = time.time()
+        blocked = self.blocked_until.get(resource, 0)
+        if blocked > now:
+            raise RateLimited(resource, blocked)
+        budget = self.budget.get(resource)
+        if budget and budget["remaining"] <= 0 and budget["reset"] > now:
+            raise RateLimited(resource, budget["reset"])
+
+    def _record_budget(self, resp, resource):
+        headers = resp.headers
+        resource = headers.get("x-ratelimit-resource", resource)
+        if "x-ratelimit-remaining" not in headers:
+            return resource
+        try:
+            remaining = int(headers["x-ratelimit-remaining"])
+            self.budget[resource] = {
+                "limit": int(headers.get("x-ratelimit-limit", remaining)),
+                "remaining": remaining,
+                "reset": float(headers.get("x-ratelimit-reset", 0)),
+            }
+        except ValueError:
+            return resource
+        bucket = self.buckets.get(resource)
+        if bucket is not None:
+            bucket.sync(remaining)
+        return resource
+
+    def _retry_after(self, resp, resource):
+        """Seconds to wait before retrying a rate-limited response, or None if it isn't one."""
+        if resp.status_code not in (403, 429):
+            return None
+        if "retry-after" in resp.headers:
+            try:
+                return max(0.0, float(resp.headers["retry-after"]))
+            except ValueError:
+                return GITHUB_BACKOFF_BASE
+        if resp.headers.get("x-ratelimit-remaining") == "0":
+            return max(0.0, float(resp.headers.get("x-ratelimit-reset", 0)) - time.time())
+        return None
+
+    async def _fetch(self, url, cached, resource, timeout):
+        import httpx
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        # A 304 doesn't count against the quota, so conditional requests are only
+        # charged once the answer turns out to be something else
+        conditional = "If-None-Match" in headers or "If-Modified-Since" in headers
+
+        client = await self.client_factory()
+        for attempt in range(GITHUB_MAX_RETRIES + 1):
+            self._check_budget(resource)
+            bucket = self.buckets.get(resource)
+            if bucket is not None and not conditional and not await bucket.acquire(GITHUB_MAX_WAIT):
+                self.counters["throttled"] += 1
+                raise RateLimited(resource, time.time() + bucket.wait_time())
+
+            try:
+                kwargs = {"headers": headers} if timeout is None else {"headers": headers, "timeout": timeout}
+                resp = await client.get(url, **kwargs)
+            except httpx.HTTPError as e:
+                error = UpstreamError(repr(e))
+            else:
+                if conditional and resp.status_code != 304 and bucket is not None:
+                    bucket.spend()
+                resource = self._record_budget(resp, resource)
+                if resp.status_code == 304 and cached:
+                    await self._cached("touch", url)
+                    self.counters["revalidated"] += 1
+                    return cached["body"]
+                if resp.status_code == 200:
+                    try:
+                        body = resp.json()
+                    except ValueError as e:
+                        raise UpstreamError(f"Invalid JSON from {url}: {e}")
+                    await self._cached("put", url, body, resp.headers.get("etag"), resp.headers.get("last-modified"))
+                    self.counters["fetched"] += 1
+                    return body
+
+                retry_after = self._retry_after(resp, resource)
+                if retry_after is not None:
+                    if retry_after > GITHUB_MAX_WAIT:
+                        self.blocked_until[resource] = time.time() + retry_after
+                        self.counters["throttled"] += 1
+                        raise RateLimited(resource, self.blocked_until[resource])
+                    error = UpstreamError(f"GitHub {resp.status_code} (rate limited)")
+                    if attempt < GITHUB_MAX_RETRIES:
+                        self.counters["retries"] += 1
+                        await asyncio.sleep(retry_after + backoff_delay(attempt))
+                        continue
+                elif resp.status_code < 500:
+                    # Client errors won't improve on retry
+                    self.counters["errors"] += 1
+                    raise UpstreamError(f"GitHub {resp.status_code} for {url}")
+                else:
+                    error = UpstreamError(f"GitHub {resp.status_code} for {url}")
+
+            if attempt < GITHUB_MAX_RETRIES:
+                self.counters["retries"] += 1
+                await asyncio.sleep(backoff_delay(attempt))
+        self.counters["errors"] += 1
+        raise error
+
+    async def close(self):
+        for task in list(self._revalidating.values()):
+            task.cancel()
+        await asyncio.gather(*self._revalidating.values(), return_exceptions=True)
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def stats(self):
+        # Counts cache rows, so call it from a thread
+        return {
+            **self.counters,
+            "cache_entries": len(self.cache) if self._cache is not None else 0,
+            "budget": self.budget,
+            "blocked_until": {r: t for r, t in self.blocked_until.items() if t > time.time()},
+        }
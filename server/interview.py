@@ -0,0 +1,329 @@
+import asyncio
+import json
+import os
+import time
+from collections import Counter, deque
+
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketDisconnect
+
+import telemetry
+from ai_engine import normalize_skill, score_from_matches
+from certificate_processing import SKILL_KEYWORDS
+from search_index import candidate_index
+
+INTERVIEW_MAX_SESSIONS = int(os.getenv("INTERVIEW_MAX_SESSIONS", "500"))
+INTERVIEW_MAX_CHUNK_CHARS = int(os.getenv("INTERVIEW_MAX_CHUNK_CHARS", "4000"))
+INTERVIEW_IDLE_SECONDS = float(os.getenv("INTERVIEW_IDLE_SECONDS", "300"))
+# New sessions pick up skills added to the corpus at most this often
+INTERVIEW_VOCAB_REFRESH_SECONDS = float(os.getenv("INTERVIEW_VOCAB_REFRESH_SECONDS", "300"))
+
+# Phrases that say something about how a candidate answers, not what they know
+SIGNAL_KEYWORDS = {
+    "ownership": ("lead", "led", "owned", "drove", "i built", "designed", "architected", "mentored"),
+    "collaboration": ("team", "we", "together", "paired", "collaborated", "stakeholders", "code review"),
+    "problem_solving": ("solve", "solved", "debug", "debugged", "optimize", "optimized", "trade-off",
+                        "tradeoff", "because", "root cause", "complexity", "edge case"),
+    "experience": ("experience", "years", "shipped", "production", "deployed", "scaled", "maintained"),
+    "hedging": ("maybe", "i think", "not sure", "i guess", "probably", "kind of", "sort of", "um", "uh"),
+    "positive": ("enjoy", "enjoyed", "love", "excited", "great", "happy", "proud", "learned", "interesting"),
+    "negative": ("hate", "boring", "frustrating", "bad", "failed", "annoying", "terrible"),
+}
+ASSERTIVE_SIGNALS = ("ownership", "problem_solving", "experience")
+SUBSTANCE_SIGNALS = ("ownership", "collaboration", "problem_solving", "experience")
+
+# Kept inside words so "c++", "c#" and "node.js" survive normalization
+WORD_SYMBOLS = "+#_"
+
+def is_word_char(ch):
+    return ch.isalnum() or ch in WORD_SYMBOLS
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over whole-word phrases: one left-to-right pass over the
+    text finds every phrase, however many there are. Phrases are stored padded with
+    spaces, so word boundaries are matched by the automaton itself.
+    """
+    def __init__(self, phrases):
+        """phrases: {phrase: payload}; phrases are normalized like the text they're matched in."""
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        self.payloads = []
+        self.phrases = set()  # normalized
+        for phrase, payload in phrases.items():
+            normalized = normalize_text(phrase)
+            if not normalized:
+                continue
+            self.phrases.add(normalized)
+            state = 0
+            for ch in f" {normalized} ":
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                    self.goto[state][ch] = nxt
+                state = nxt
+            if not self.out[state]:
+                self.out[state] = (len(self.payloads),)
+                self.payloads.append(payload)
+
+        # Breadth-first, so every fail target is finished before it's needed
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def __len__(self):
+        return len(self.payloads)
+
+class KeywordScanner:
+    """
+    Streaming matcher: normalizes text as it arrives and advances the automaton, so
+    each piece is scanned exactly once, whatever came before it.
+    """
+    def __init__(self, automaton):
+        self.automaton = automaton
+        self.state = 0
+        self.words = 0
+        self._in_word = False
+        self._pending_dot = False
+        self._emit(" ", [])
+
+    def _emit(self, ch, found):
+        goto, fail, out = self.automaton.goto, self.automaton.fail, self.automaton.out
+        state = self.state
+        while state and ch not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(ch, 0)
+        if out[state]:
+            found.extend(out[state])
+        self.state = state
+
+    def feed(self, text):
+        """Returns the payload indices of phrases completed by this piece of text."""
+        found = []
+        emit = self._emit
+        for ch in text.lower():
+            if is_word_char(ch):
+                if self._pending_dot:
+                    # A dot between word characters is part of the word ("node.js")
+                    emit(".", found)
+                    self._pending_dot = False
+                elif not self._in_word:
+                    self.words += 1
+                    self._in_word = True
+                emit(ch, found)
+            elif ch == "." and self._in_word and not self._pending_dot:
+                self._pending_dot = True
+            elif self._in_word or self._pending_dot:
+                self._in_word = False
+                self._pending_dot = False
+                emit(" ", found)
+        return found
+
+    def finish(self):
+        """Ends the stream, completing a phrase that was the very last word."""
+        found = []
+        if self._in_word or self._pending_dot:
+            self._in_word = False
+            self._pending_dot = False
+            self._emit(" ", found)
+        return found
+
+def normalize_text(text):
+    """The normalized form KeywordScanner matches against, for a whole string."""
+    out = []
+    in_word = pending_dot = False
+    for ch in text.lower():
+        if is_word_char(ch):
+            if pending_dot:
+                out.append(".")
+                pending_dot = False
+            elif not in_word and out:
+                out.append(" ")
+            in_word = True
+            out.append(ch)
+        elif ch == "." and in_word and not pending_dot:
+            pending_dot = True
+        else:
+            in_word = pending_dot = False
+    return "".join(out)
+
+def build_automaton(known_skills=()):
+    phrases = {}
+    for signal, keywords in SIGNAL_KEYWORDS.items():
+        for keyword in keywords:
+            phrases[keyword] = ("signal", signal)
+    for key, name in SKILL_KEYWORDS.items():
+        phrases[key] = ("skill", name)
+    # Very short names ("Go", "C") match ordinary words too often to trust
+    for skill in known_skills:
+        if len(skill) > 2:
+            phrases.setdefault(skill.lower(), ("skill", skill))
+    return KeywordAutomaton(phrases)
+
+_automaton = None  # (index generation, built at, automaton)
+_rebuild = None  # background rebuild in progress
+
+def current_automaton():
+    """
+    The automaton for new sessions: built-in keywords plus every skill in the corpus.
+    When the corpus has changed, at most every INTERVIEW_VOCAB_REFRESH_SECONDS, a new one
+    is built in a thread while the previous one keeps serving.
+    """
+    global _automaton, _rebuild
+    generation = candidate_index.generation
+    if _automaton is None:
+        # Only before the first build; the app builds one at startup
+        _automaton = (generation, time.monotonic(), build_automaton(candidate_index.known_skills()))
+    elif (_automaton[0] != generation and _rebuild is None
+          and time.monotonic() - _automaton[1] >= INTERVIEW_VOCAB_REFRESH_SECONDS):
+        try:
+            _rebuild = asyncio.get_running_loop().create_task(refresh_automaton())
+        except RuntimeError:
+            # Called from a thread: building here blocks no one else
+            _automaton = (generation, time.monotonic(), build_automaton(candidate_index.known_skills()))
+    return _automaton[2]
+
+async def refresh_automaton():
+    """
+    Builds the automaton for the current corpus off the event loop and installs it.
+    """
+    global _automaton, _rebuild
+    generation = candidate_index.generation
+    try:
+        automaton = await run_in_threadpool(lambda: build_automaton(candidate_index.known_skills()))
+        _automaton = (generation, time.monotonic(), automaton)
+    except Exception as e:
+        print(f"Interview vocabulary rebuild failed: {e!r}")
+    finally:
+        _rebuild = None
+
+class InterviewAnalysis:
+    """
+    Rolling, deterministic scores for one answer as it's transcribed. Each chunk is
+    scanned once and only updates counts, so a message costs the same early or late
+    in a long answer.
+
+    Required skills the shared automaton doesn't know get a small one of their own for
+    the session, scanned alongside it.
+    """
+    def __init__(self, automaton, required_skills=()):
+        self.scanner = KeywordScanner(automaton)
+        self.required = {normalize_skill(s) for s in required_skills if str(s).strip()}
+        missing = {}
+        for skill in required_skills:
+            normalized = normalize_text(str(skill))
+            if normalized and normalized not in automaton.phrases:
+                missing.setdefault(normalized, ("skill", str(skill).strip()))
+        self.extra = KeywordScanner(KeywordAutomaton(missing)) if missing else None
+        self.skills = Counter()
+        self.signals = Counter()
+        self.chunks = 0
+
+    def _count(self, scanner, found):
+        payloads = scanner.automaton.payloads
+        for index in found:
+            kind, name = payloads[index]
+            (self.skills if kind == "skill" else self.signals)[name] += 1
+
+    def feed(self, text):
+        self.chunks += 1
+        self._count(self.scanner, self.scanner.feed(text))
+        if self.extra is not None:
+            self._count(self.extra, self.extra.feed(text))
+        return self.scores()
+
+    def finish(self):
+        self._count(self.scanner, self.scanner.finish())
+        if self.extra is not None:
+            self._count(self.extra, self.extra.finish())
+        return self.scores()
+
+    def scores(self):
+        words = self.scanner.words
+        mentioned = {normalize_skill(s) for s in self.skills}
+        if self.required:
+            skill_score = score_from_matches(len(mentioned & self.required), len(self.required))
+        else:
+            skill_score = score_from_matches(len(mentioned), len(mentioned))
+        assertive = sum(self.signals[s] for s in ASSERTIVE_SIGNALS)
+        hedges_per_100_words = 100 * self.signals["hedging"] / max(words, 20)
+        confidence = 0.55 + 0.05 * min(assertive, 8) - 0.05 * hedges_per_100_words
+        tone = self.signals["positive"] - self.signals["negative"]
+        substance = len(mentioned) + sum(1 for s in SUBSTANCE_SIGNALS if self.signals[s])
+        return {
+            "seq": self.chunks,
+            "words": words,
+            "skills": [{"skill": s, "mentions": n} for s, n in sorted(self.skills.items())],
+            "signals": dict(self.signals),
+            "skill_score": int(skill_score),
+            "confidence": round(min(0.99, max(0.05, confidence)), 2),
+            "sentiment": "positive" if tone > 0 else "negative" if tone < 0 else "neutral",
+            "feedback": "Good technical understanding." if substance > 2 else "Could be more specific.",
+        }
+
+def analyze_text(text, required_skills=()):
+    """One-shot analysis of a complete answer."""
+    analysis = InterviewAnalysis(current_automaton(), required_skills)
+    analysis.feed(text)
+    return analysis.finish()
+
+active_sessions = {}  # connection id -> (session id, user id)
+
+async def serve_session(websocket, session_id, user, required_skills=()):
+    """
+    Runs one interview stream. Each text frame is a transcript chunk, either plain text
+    or {"text": ..., "final": bool}; every chunk is answered with the updated scores,
+    and a final chunk with {"type": "final"} before the socket closes.
+    """
+    if len(active_sessions) >= INTERVIEW_MAX_SESSIONS:
+        await websocket.close(code=1013, reason="Too many interview sessions, retry shortly")
+        return
+    await websocket.accept()
+    analysis = InterviewAnalysis(current_automaton(), required_skills)
+    connection = id(websocket)
+    active_sessions[connection] = (session_id, user.id)
+    try:
+        while True:
+            try:
+                raw = await asyncio.wait_for(websocket.receive_text(), INTERVIEW_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="Idle timeout")
+                return
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = {"text": raw}
+            if not isinstance(message, dict):
+                message = {"text": raw}
+            text = message.get("text") or ""
+            if not isinstance(text, str) or len(text) > INTERVIEW_MAX_CHUNK_CHARS:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": f"Chunks must be text of at most {INTERVIEW_MAX_CHUNK_CHARS} characters",
+                })
+                continue
+
+            with telemetry.stage("interview_chunk"):
+                scores = analysis.feed(text)
+                if message.get("final"):
+                    scores = analysis.finish()
+            if message.get("final"):
+                await websocket.send_json({"type": "final", "session_id": session_id, **scores})
+                await websocket.close()
+                return
+            await websocket.send_json({"type": "score", **scores})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        active_sessions.pop(connection, None)
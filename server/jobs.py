@@ -0,0 +1,311 @@
+import asyncio
+import os
+import time
+import traceback
+
+from starlette.concurrency import run_in_threadpool
+
+import models
+from database import SessionLocal
+
+JOB_BACKEND = os.getenv("JOB_BACKEND", "db")  # "db" (jobs table) or "memory"
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# Running jobs not updated for this long are assumed orphaned by a dead worker
+JOB_LOCK_TIMEOUT = float(os.getenv("JOB_LOCK_TIMEOUT", "300"))
+# How often idle workers look for such jobs
+JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", "30"))
+JOB_LOST_ERROR = "Worker lost while running the job"
+
+JOB_FIELDS = ("id", "kind", "user_id", "status", "attempts", "max_attempts", "progress",
+              "message", "result", "error", "created_at", "updated_at")
+
+def retry_delay(attempts):
+    return JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+
+class QueueBackend:
+    """
+    Storage for jobs. Methods are synchronous; the queue calls them off the event loop.
+    """
+    def enqueue(self, kind, payload, user_id=None, max_attempts=JOB_MAX_ATTEMPTS):
+        """Returns the new job id."""
+        raise NotImplementedError
+
+    def claim(self):
+        """Atomically moves one due job to running and returns it as a dict, or None."""
+        raise NotImplementedError
+
+    def update(self, job_id, **fields):
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def requeue_stale(self, older_than):
+        """
+        Recovers running jobs locked before older_than: back to queued, or failed once the
+        claim that orphaned them was their last attempt. Returns how many were recovered.
+        """
+        raise NotImplementedError
+
+class SQLQueueBackend(QueueBackend):
+    """
+    Persistent queue on the `jobs` table; claims are safe across worker processes.
+    """
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def enqueue(self, kind, payload, user_id=None, max_attempts=JOB_MAX_ATTEMPTS):
+        now = time.time()
+        with self.session_factory() as db:
+            job = models.Job(kind=kind, payload=payload, user_id=user_id, status="queued",
+                             attempts=0, max_attempts=max_attempts, progress=0,
+                             run_after=now, created_at=now, updated_at=now)
+            db.add(job)
+            db.commit()
+            return job.id
+
+    def claim(self):
+        now = time.time()
+        with self.session_factory() as db:
+            for _ in range(5):
+                job = (
+                    db.query(models.Job)
+                    .filter(models.Job.status == "queued", models.Job.run_after <= now)
+                    .order_by(models.Job.run_after, models.Job.id)
+                    .first()
+                )
+                if job is None:
+                    return None
+                # Compare-and-set so two workers can't both take the same row
+                claimed = (
+                    db.query(models.Job)
+                    .filter(models.Job.id == job.id, models.Job.status == "queued")
+                    .update({"status": "running", "attempts": models.Job.attempts + 1,
+                             "locked_at": now, "updated_at": now}, synchronize_session=False)
+                )
+                db.commit()
+                if claimed:
+                    db.refresh(job)
+                    return self._as_dict(job)
+        return None
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        if fields.get("status") == "running":
+            fields["locked_at"] = fields["updated_at"]
+        with self.session_factory() as db:
+            db.query(models.Job).filter(models.Job.id == job_id).update(fields, synchronize_session=False)
+            db.commit()
+
+    def get(self, job_id):
+        with self.session_factory() as db:
+            job = db.get(models.Job, job_id)
+            return self._as_dict(job) if job else None
+
+    def requeue_stale(self, older_than):
+        now = time.time()
+        with self.session_factory() as db:
+            stale = db.query(models.Job).filter(models.Job.status == "running", models.Job.locked_at < older_than)
+            # A job that keeps killing its worker must not come back forever
+            failed = (
+                stale.filter(models.Job.attempts >= models.Job.max_attempts)
+                .update({"status": "failed", "error": JOB_LOST_ERROR, "updated_at": now}, synchronize_session=False)
+            )
+            requeued = (
+                stale.filter(models.Job.attempts < models.Job.max_attempts)
+                .update({"status": "queued", "run_after": now, "error": JOB_LOST_ERROR, "updated_at": now},
+                        synchronize_session=False)
+            )
+            db.commit()
+            return failed + requeued
+
+    @staticmethod
+    def _as_dict(job):
+        data = {field: getattr(job, field) for field in JOB_FIELDS}
+        data["payload"] = job.payload
+        return data
+
+class MemoryQueueBackend(QueueBackend):
+    """
+    In-process stand-in for an external broker; jobs are lost on restart.
+    """
+    def __init__(self):
+        self._jobs = {}
+        self._next_id = 1
+
+    def enqueue(self, kind, payload, user_id=None, max_attempts=JOB_MAX_ATTEMPTS):
+        now = time.time()
+        job_id = self._next_id
+        self._next_id += 1
+        self._jobs[job_id] = {
+            "id": job_id, "kind": kind, "user_id": user_id, "payload": payload,
+            "status": "queued", "attempts": 0, "max_attempts": max_attempts, "progress": 0,
+            "message": None, "result": None, "error": None, "run_after": now,
+            "locked_at": None, "created_at": now, "updated_at": now,
+        }
+        return job_id
+
+    def claim(self):
+        now = time.time()
+        due = [j for j in self._jobs.values() if j["status"] == "queued" and j["run_after"] <= now]
+        if not due:
+            return None
+        job = min(due, key=lambda j: (j["run_after"], j["id"]))
+        job.update(status="running", attempts=job["attempts"] + 1, locked_at=now, updated_at=now)
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def requeue_stale(self, older_than):
+        now = time.time()
+        stale = [j for j in self._jobs.values() if j["status"] == "running" and j["locked_at"] < older_than]
+        for job in stale:
+            if job["attempts"] >= job["max_attempts"]:
+                job.update(status="failed", error=JOB_LOST_ERROR, updated_at=now)
+            else:
+                job.update(status="queued", run_after=now, error=JOB_LOST_ERROR, updated_at=now)
+        return len(stale)
+
+class JobContext:
+    """
+    Passed to handlers so they can report progress.
+    """
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job = job
+
+    async def progress(self, percent, message=None):
+        # Also renews the lock, so a long job that reports progress isn't taken for orphaned
+        await self.queue._call(self.queue.backend.update, self.job["id"], progress=int(percent), message=message,
+                               locked_at=time.time())
+
+class JobQueue:
+    """
+    Runs registered handlers for queued jobs on a fixed number of worker tasks.
+    Failed jobs are retried with exponential backoff up to their max_attempts.
+    """
+    def __init__(self, backend=None, concurrency=JOB_CONCURRENCY):
+        self._backend = backend
+        self.concurrency = concurrency
+        self.handlers = {}
+        self._workers = []
+        self._wakeup = None
+        self._swept_at = 0.0
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def backend(self):
+        # Created on first use so importing this module touches no database
+        if self._backend is None:
+            self._backend = make_backend()
+        return self._backend
+
+    def handler(self, kind):
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    async def _call(self, fn, *args, **kwargs):
+        if isinstance(self.backend, MemoryQueueBackend):
+            return fn(*args, **kwargs)
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    async def enqueue(self, kind, payload, user_id=None, max_attempts=JOB_MAX_ATTEMPTS):
+        job_id = await self._call(self.backend.enqueue, kind, payload, user_id, max_attempts)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id):
+        return await self._call(self.backend.get, job_id)
+
+    async def start(self):
+        await self.sweep()
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def sweep(self):
+        """Recovers jobs orphaned by a worker that died, in this process or another one."""
+        self._swept_at = time.monotonic()
+        count = await self._call(self.backend.requeue_stale, time.time() - JOB_LOCK_TIMEOUT)
+        if count:
+            print(f"Recovered {count} orphaned job(s)")
+        return count
+
+    async def run_pending(self):
+        """
+        Processes due jobs until none are left. Handy for CLIs and tests.
+        """
+        while await self._run_one():
+            pass
+
+    async def _worker(self):
+        while True:
+            try:
+                if await self._run_one():
+                    continue
+                if time.monotonic() - self._swept_at >= JOB_SWEEP_SECONDS:
+                    await self.sweep()
+            except Exception:
+                traceback.print_exc()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_one(self):
+        job = await self._call(self.backend.claim)
+        if job is None:
+            return False
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job['kind']!r}")
+            result = await handler(job["payload"], JobContext(self, job))
+        except asyncio.CancelledError:
+            # Shutting down mid-job: hand it back for the next worker
+            await self._call(self.backend.update, job["id"], status="queued", run_after=time.time())
+            raise
+        except Exception as e:
+            self.failed += 1
+            print(f"Job {job['id']} ({job['kind']}) failed: {e!r}")
+            if job["attempts"] < job["max_attempts"]:
+                await self._call(self.backend.update, job["id"], status="queued", error=repr(e),
+                                 run_after=time.time() + retry_delay(job["attempts"]))
+            else:
+                await self._call(self.backend.update, job["id"], status="failed", error=repr(e))
+        else:
+            self.processed += 1
+            await self._call(self.backend.update, job["id"], status="done", progress=100,
+                             result=result, error=None)
+        return True
+
+    def stats(self):
+        return {"workers": len(self._workers), "processed": self.processed, "failed": self.failed}
+
+def make_backend(kind=JOB_BACKEND):
+    if kind == "db":
+        return SQLQueueBackend()
+    if kind == "memory":
+        return MemoryQueueBackend()
+    raise ValueError(f"Unknown job backend: {kind}")
+
+job_queue = JobQueue()
@@ -1,131 +1,337 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, status, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 from datetime import timedelta
 from typing import List
+import json
 import os
-import shutil
+import tempfile
 
-from database import engine, get_db, Base
-import models
+from starlette.concurrency import run_in_threadpool
+from database import engine, get_db, SessionLocal, run_db, dispose_engines
+import crud
 import schemas
 import auth
-from integrations import search_candidates
+import migrations
+from integrations import close_http_client, github
+from cache import search_cache
+from search_index import candidate_index
+from snapshot import candidate_sync, latest_change
+from federation import federated_search, SEARCH_TOP_K
+from suggest import suggestion_index, SUGGESTION_KINDS
+from fulltext import get_fulltext_engine
+from semantic import vector_index
+from teams import form_teams
+from jobs import job_queue
+import bulk_import
+import telemetry
+import interview
+import certificate_processing  # registers the certificate job handler
+from uploads import (UPLOAD_DIR, CERT_SIGNED_URLS, LegacyUploads, receive_upload, certificate_url,
+                     thumbnail_url, sign_certificate_url, serve_certificate, serve_thumbnail)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+fulltext = get_fulltext_engine(engine)
+router = APIRouter()
 
-app = FastAPI(title="TRACE API", description="Backend for TRACE: AI-Driven Team Formation")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema and directories are checked here rather than at import, so tools and tests
+    # that only import this module don't touch the database or the filesystem
+    await run_in_threadpool(migrations.ensure_schema)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Embeddings persist across restarts; only changed profiles are re-embedded below
+    vector_index.open()
+    candidate_index.subscribe(vector_index)
+    candidate_index.subscribe(suggestion_index)
+    # Build the in-memory candidate index once; writes keep it current afterwards, and the
+    # change log brings in other workers' writes. Its position is read first, so edits made
+    # while loading are applied again rather than missed.
+    candidate_sync.mark_loaded(await run_in_threadpool(latest_change))
+    for c in MOCK_CANDIDATES:
+        candidate_index.upsert(("mock", c["id"]), c)
+    with SessionLocal() as db:
+        candidate_index.load_profiles(db)
+    vector_index.prune_unseen()
+    vector_index.save()
+    await job_queue.start()
+    await candidate_sync.start()
+    # Interview sessions start from this vocabulary; later rebuilds also run in a thread
+    await interview.refresh_automaton()
+    yield
+    await candidate_sync.stop()
+    await job_queue.stop()
+    vector_index.close()
+    # The pooled upstream client is opened on the first GitHub call, if any
+    await close_http_client()
+    await dispose_engines()
+    auth.hash_pool.shutdown()
 
-# Mount uploads directory to serve files
-if not os.path.exists("uploads"):
-    os.makedirs("uploads")
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+def create_app():
+    """
+    Builds the ASGI app without side effects; run with `uvicorn main:app` or
+    `uvicorn --factory main:create_app`.
+    """
+    app = FastAPI(
+        title="TRACE API",
+        description="Backend for TRACE: AI-Driven Team Formation",
+        lifespan=lifespan,
+    )
+    # Pre-content-addressing uploads keep their public links; signed mode promises links
+    # that expire, so it doesn't serve them at all
+    if not CERT_SIGNED_URLS:
+        app.mount("/uploads", LegacyUploads(directory=UPLOAD_DIR, check_dir=False), name="uploads")
+
+    # CORS setup
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing"],
+    )
+    # Outermost, so the timings include CORS and error handling
+    app.add_middleware(telemetry.TracingMiddleware)
+    app.include_router(router)
+    return app
 
-# CORS setup
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Cache effectiveness and queue depths, read from each component's own counters on scrape
+telemetry.register_cache("search", lambda: (search_cache.hits + search_cache.coalesced, search_cache.misses))
+telemetry.register_cache("github", lambda: (
+    github.counters["fresh"] + github.counters["stale"] + github.counters["revalidated"],
+    github.counters["fetched"],
+))
+telemetry.register_cache("token", lambda: (auth.token_cache.hits, auth.token_cache.misses))
+telemetry.register_cache("suggest", lambda: (suggestion_index.hits, suggestion_index.misses))
+telemetry.metrics.gauge("trace_db_pool_checked_out", "Connections currently checked out of the pool.",
+                        lambda: engine.pool.checkedout())
+telemetry.metrics.gauge("trace_bcrypt_in_flight", "Password hashes running or queued.",
+                        lambda: auth.hash_pool.in_flight)
+telemetry.metrics.callback_counter("trace_jobs_total", "Background jobs finished by this worker.",
+                                   lambda: {("done",): job_queue.processed, ("failed",): job_queue.failed},
+                                   ("result",))
+telemetry.metrics.gauge("trace_interview_sessions", "Open interview WebSocket sessions.",
+                        lambda: len(interview.active_sessions))
+telemetry.metrics.gauge("trace_candidate_index_size", "Candidates in the in-memory search index.",
+                        lambda: len(candidate_index))
+telemetry.metrics.callback_counter("trace_candidate_changes_applied_total",
+                                   "Profile changes by other processes applied from the change log.",
+                                   lambda: candidate_sync.applied)
 
-@app.get("/")
+@router.get("/")
 async def root():
     return {"message": "Welcome to TRACE API"}
 
 # --- Auth Endpoints ---
 
-@app.post("/auth/signup", response_model=schemas.Token)
-async def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+@router.post("/auth/signup", response_model=schemas.Token)
+async def signup(user: schemas.UserCreate, db=Depends(get_db)):
+    db_user = await run_db(db, crud.get_user_by_email, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth.get_password_hash(user.password)
-    new_user = models.User(email=user.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    # Create empty profile for user
-    new_profile = models.Profile(user_id=new_user.id, full_name="", skills=[])
-    db.add(new_profile)
-    db.commit()
+    hashed_password = await auth.hash_password(user.password)
+    new_user = await run_db(db, crud.create_user, user.email, hashed_password)
 
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": new_user.email}, expires_delta=access_token_expires
+        data=auth.user_claims(new_user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/auth/login", response_model=schemas.Token)
-async def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if not db_user or not auth.verify_password(user.password, db_user.hashed_password):
+@router.post("/auth/login", response_model=schemas.Token)
+async def login(user: schemas.UserLogin, db=Depends(get_db)):
+    db_user = await run_db(db, crud.get_user_by_email, user.email)
+    valid, new_hash = False, None
+    if db_user:
+        valid, new_hash = await auth.verify_and_update_password(user.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Configured bcrypt cost changed since this password was stored
+        await run_db(db, crud.update_password_hash, db_user, new_hash)
+        auth.token_cache.invalidate_user(db_user.id)
     
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": db_user.email}, expires_delta=access_token_expires
+        data=auth.user_claims(db_user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.get("/auth/stats")
+async def auth_stats():
+    return {**auth.hash_pool.stats(), "token_cache": auth.token_cache.stats()}
+
 # --- Profile Endpoints ---
 
-@app.get("/api/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
-    return current_user
+@router.get("/api/me", response_model=schemas.User)
+async def read_users_me(
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+    db=Depends(get_db)
+):
+    return await run_db(db, crud.get_user_graph, current_user.id)
 
-@app.put("/api/profile", response_model=schemas.Profile)
+@router.put("/api/profile", response_model=schemas.Profile)
 async def update_profile(
     profile_update: schemas.ProfileUpdate,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+    db=Depends(get_db)
 ):
-    profile = current_user.profile
-    if not profile:
-        profile = models.Profile(user_id=current_user.id)
-        db.add(profile)
-    
-    for key, value in profile_update.dict(exclude_unset=True).items():
-        setattr(profile, key, value)
-    
-    db.commit()
-    db.refresh(profile)
+    changes = profile_update.dict(exclude_unset=True)
+    profile, candidate = await run_db(db, crud.save_profile, current_user, changes)
+    candidate_index.upsert(("profile", profile.user_id), candidate)
+    auth.token_cache.invalidate_user(current_user.id)
     return profile
 
-@app.post("/api/upload")
+@router.get("/api/profiles", response_model=schemas.UserPage)
+async def list_profiles(
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+    db=Depends(get_db)
+):
+    users = await run_db(db, crud.list_users, after_id, limit)
+    next_after_id = users[-1].id if len(users) == limit else None
+    return {"users": users, "next_after_id": next_after_id}
+
+@router.post("/api/admin/import", response_model=schemas.BulkImportReport)
+async def import_profiles(
+    request: Request,
+    format: str = Query(None, pattern="^(csv|jsonl)$"),
+    chunk_size: int = Query(bulk_import.BULK_CHUNK_SIZE, ge=1, le=5000),
+    admin: auth.CurrentUser = Depends(auth.get_admin_user)
+):
+    fmt = format or bulk_import.detect_format(content_type=request.headers.get("content-type"))
+    # Spool the body to disk so large exports are parsed as a stream, not held in memory
+    spool = await run_in_threadpool(tempfile.TemporaryFile)
+    try:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > bulk_import.BULK_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Import exceeds {bulk_import.BULK_MAX_BYTES} bytes")
+            await run_in_threadpool(spool.write, chunk)
+        await run_in_threadpool(spool.seek, 0)
+        report, candidates = await run_in_threadpool(bulk_import.import_file, spool, fmt, chunk_size)
+    finally:
+        await run_in_threadpool(spool.close)
+
+    # Search indexes catch up once, after every chunk is committed
+    for user_id, candidate in candidates:
+        candidate_index.upsert(("profile", user_id), candidate)
+    if candidates:
+        await vector_index.persist()
+    return report
+
+@router.get("/api/profiles/search", response_model=schemas.ProfileSearchResults)
+async def search_profiles(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db=Depends(get_db)
+):
+    results, ranked = await run_db(db, crud.search_profiles, fulltext, q, limit, offset)
+    next_offset = offset + limit if ranked == limit else None
+    return {"results": results, "limit": limit, "offset": offset, "next_offset": next_offset}
+
+@router.post("/api/upload")
 async def upload_certificate(
-    file: UploadFile = File(...),
+    request: Request,
     description: str = "",
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+    db=Depends(get_db)
 ):
-    file_location = f"uploads/{current_user.id}_{file.filename}"
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
-    
-    # Generate URL (assuming local serving)
-    # In production, this would be an S3 URL
-    url = f"http://localhost:8000/{file_location}"
+    # Streamed straight from the request body: hashed, size-capped and stored by content
+    stored = await receive_upload(request, field="file")
+    description = description or stored.fields.get("description", "")
+
+    # Stored unsigned; in signed-URL mode links are signed whenever they are handed out
+    url = certificate_url(request, stored)
     
-    certificate = models.Certificate(
-        user_id=current_user.id,
-        filename=file.filename,
-        description=description,
-        url=url
-    )
-    db.add(certificate)
-    db.commit()
-    db.refresh(certificate)
-    return {"info": "file saved", "url": url}
+    certificate = await run_db(db, crud.create_certificate, current_user.id, stored.filename, description, url)
+    # Text extraction, skill detection and verification happen after the response
+    job_id = await job_queue.enqueue("process_certificate", {
+        "certificate_id": certificate.id,
+        "user_id": current_user.id,
+        "path": stored.path,
+        "sha256": stored.sha256,
+        "filename": stored.filename,
+        "description": description,
+        "thumbnail_url": thumbnail_url(request, stored.sha256),
+    }, user_id=current_user.id)
+    return {
+        "info": "file saved",
+        "url": sign_certificate_url(url),
+        "sha256": stored.sha256,
+        "size": stored.size,
+        "job_id": job_id,
+    }
+
+@router.get("/api/admin/certificates/pending", response_model=List[schemas.Certificate])
+async def pending_certificates(
+    limit: int = Query(50, ge=1, le=200),
+    admin: auth.CurrentUser = Depends(auth.get_admin_user),
+    db=Depends(get_db)
+):
+    return await run_db(db, crud.list_pending_certificates, limit)
+
+@router.post("/api/admin/certificates/{certificate_id}/review", response_model=schemas.Certificate)
+async def review_certificate(
+    certificate_id: int,
+    review: schemas.CertificateReview,
+    admin: auth.CurrentUser = Depends(auth.get_admin_user)
+):
+    reviewed = await run_in_threadpool(certificate_processing.review_certificate, certificate_id, review.approved)
+    if reviewed is None:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    certificate, candidate = reviewed
+    if candidate is not None:
+        candidate_index.upsert(("profile", certificate.user_id), candidate)
+    # Verification is a token claim; the owner's cached tokens must pick it up
+    auth.token_cache.invalidate_user(certificate.user_id)
+    return certificate
+
+@router.get("/api/jobs/stats")
+async def job_stats():
+    return job_queue.stats()
+
+@router.get("/api/jobs/{job_id}", response_model=schemas.JobStatus)
+async def get_job(job_id: int, current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    job = await job_queue.get(job_id)
+    if job is None or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = job.get("result")
+    if isinstance(result, dict) and result.get("thumbnail"):
+        job = {**job, "result": {**result, "thumbnail": sign_certificate_url(result["thumbnail"])}}
+    return job
+
+# --- Interview ---
+
+@router.websocket("/ws/interview/{session_id}")
+async def interview_socket(websocket: WebSocket, session_id: str, token: str = "", skills: str = ""):
+    """
+    Live analysis of a transcript streamed in chunks; scores are pushed back after each.
+    Browsers can't set headers on WebSockets, so the bearer token comes as ?token=.
+    """
+    try:
+        user = await auth.authenticate_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await interview.serve_session(websocket, session_id, user, [s for s in skills.split(",") if s.strip()])
+
+@router.api_route("/certificates/thumbnails/{name}", methods=["GET", "HEAD"])
+async def get_thumbnail(name: str, request: Request):
+    return await serve_thumbnail(request, name)
+
+@router.api_route("/certificates/{name}", methods=["GET", "HEAD"])
+async def get_certificate(name: str, request: Request):
+    return await serve_certificate(request, name)
 
 # --- Search Capability (Preserved) ---
 
@@ -176,29 +382,126 @@ MOCK_CANDIDATES = [
     }
 ]
 
-@app.get("/api/search")
-async def search_api(query: str = ""):
+@router.get("/api/search")
+async def search_api(query: str = "", limit: int = Query(SEARCH_TOP_K, ge=1, le=100)):
     if not query:
         return {"candidates": MOCK_CANDIDATES}
     
-    # Use real integration
-    results = await search_candidates(query)
-    
-    # Fallback if no results found or API fails
-    if not results:
-         query_lower = query.lower()
-         terms = query_lower.split()
-         results = []
-         for c in MOCK_CANDIDATES:
-             # Create a searchable string from all candidate fields
-             searchable_text = f"{c['name']} {c['role']} {' '.join(c['skills'])}".lower()
-             
-             # Check if ANY of the search terms exist in the candidate data ("Free" search)
-             if any(term in searchable_text for term in terms):
-                 results.append(c)
-             # Also allow partial matches for the full query string (for cases like "Engineer")
-             elif query_lower in searchable_text:
-                 results.append(c)
+    # GitHub, local profiles and certificates in parallel; a slow source can't hold up the rest
+    result = await federated_search.collect(query, limit)
+    return {"candidates": result["candidates"], "sources": result["sources"]}
+
+@router.get("/api/search/stream")
+async def search_stream(
+    query: str = "",
+    limit: int = Query(SEARCH_TOP_K, ge=1, le=100),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$")
+):
+    """
+    Same search, streamed: an event per finished source carrying the merged top results
+    so far, then a final "done" event.
+    """
+    async def events():
+        if not query:
+            yield {"event": "done", "candidates": MOCK_CANDIDATES, "sources": {}, "elapsed_ms": 0}
+            return
+        async for event in federated_search.stream(query, limit):
+            yield event
 
+    async def body():
+        async for event in events():
+            if format == "sse":
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # No buffering in proxies, so each source's results reach the browser right away
+    return StreamingResponse(body(), media_type=media_type,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/api/suggest")
+async def suggest(
+    prefix: str = Query("", max_length=100),
+    limit: int = Query(8, ge=1, le=25),
+    kind: List[str] = Query(None)
+):
+    """
+    Typeahead for the search box: skills, roles and names from memory, cheap enough per keystroke.
+    """
+    kinds = tuple(sorted(set(kind) & set(SUGGESTION_KINDS))) if kind else None
+    return {"prefix": prefix, "suggestions": suggestion_index.suggest(prefix, limit, kinds)}
 
+@router.get("/api/search/semantic")
+async def semantic_search(query: str, limit: int = Query(10, ge=1, le=100)):
+    results = []
+    for key, similarity in vector_index.search_keys(query, limit):
+        candidate = candidate_index.get(key)
+        if candidate is not None:
+            results.append({**candidate, "similarity": round(similarity, 4)})
     return {"candidates": results}
+
+@router.post("/api/match")
+async def match_candidates(job: schemas.JobRequirements):
+    # One vectorized pass over the whole pool; only the top `limit` are sorted
+    candidates, matrix = candidate_index.skill_matrix()
+    indices, scores, counts = matrix.top_k(job.skills, job.limit)
+    return {"candidates": [
+        {**candidates[i], "match_score": int(score), "matched_skills": int(count)}
+        for i, score, count in zip(indices, scores, counts)
+    ]}
+
+@router.post("/api/teams")
+async def build_teams(request: schemas.TeamRequest):
+    candidates, matrix = candidate_index.skill_matrix()
+    return form_teams(
+        candidates,
+        matrix,
+        request.skills,
+        team_size=request.team_size,
+        verified_only=request.verified_only,
+        min_score=request.min_score,
+        max_teams=request.max_teams,
+        time_budget=request.time_budget_ms / 1000,
+    )
+
+@router.get("/api/search/stats")
+async def search_stats():
+    cache_stats = await run_in_threadpool(search_cache.stats)
+    github_stats = await run_in_threadpool(github.stats)
+    return {**cache_stats, "github": github_stats, "candidates": candidate_sync.stats()}
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(telemetry.metrics.render(), media_type="text/plain; version=0.0.4")
+
+# --- Profiling (admin) ---
+
+@router.post("/api/admin/profiler/start")
+async def start_profiler(
+    interval_ms: float = Query(telemetry.PROFILER_INTERVAL_MS, ge=1, le=1000),
+    seconds: float = Query(60, gt=0, le=telemetry.PROFILER_MAX_SECONDS),
+    admin: auth.CurrentUser = Depends(auth.get_admin_user)
+):
+    if not telemetry.profiler.start(interval_ms, seconds):
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    return telemetry.profiler.status()
+
+@router.post("/api/admin/profiler/stop")
+async def stop_profiler(admin: auth.CurrentUser = Depends(auth.get_admin_user)):
+    await run_in_threadpool(telemetry.profiler.stop)
+    return telemetry.profiler.status()
+
+@router.get("/api/admin/profiler")
+async def profiler_output(
+    format: str = Query("folded", pattern="^(folded|status)$"),
+    admin: auth.CurrentUser = Depends(auth.get_admin_user)
+):
+    """
+    Folded stacks of the last capture: pipe into flamegraph.pl or drop into speedscope.
+    """
+    if format == "status":
+        return telemetry.profiler.status()
+    return PlainTextResponse(telemetry.profiler.folded())
+
+app = create_app()
@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+import models  # registers the tables on Base.metadata
+from database import Base, engine
+from fulltext import get_fulltext_engine
+
+# Workers apply pending migrations at startup unless this is off. With several workers
+# per host, run `python migrations.py` once per deploy and set AUTO_MIGRATE=0.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1").lower() in ("1", "true", "yes")
+
+# Every migration must be safe to re-run: SQLite's driver commits DDL as it goes, and
+# two processes may race to apply the same one.
+
+def initial_schema(conn):
+    # Databases created before migrations existed already have these; checkfirst skips them.
+    # Later model changes need their own migration, tolerant of tables created here in
+    # their newer shape.
+    Base.metadata.create_all(bind=conn)
+
+def fulltext_index(conn):
+    get_fulltext_engine(conn).setup(conn)
+
+def lookup_indexes(conn):
+    # Certificates are read per user: the profile graph and certificate evidence in search
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_certificates_user_id ON certificates (user_id)"))
+
+def candidate_change_log(conn):
+    models.CandidateChange.__table__.create(bind=conn, checkfirst=True)
+
+def certificate_review(conn):
+    # Tables created by initial_schema on a fresh database already have these columns
+    columns = {c["name"] for c in inspect(conn).get_columns("certificates")}
+    if "issuers" not in columns:
+        conn.execute(text("ALTER TABLE certificates ADD COLUMN issuers JSON"))
+    if "review_status" not in columns:
+        conn.execute(text("ALTER TABLE certificates ADD COLUMN review_status VARCHAR"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_certificates_review_status ON certificates (review_status)"))
+
+MIGRATIONS = [
+    (1, "initial schema", initial_schema),
+    (2, "full-text profile index", fulltext_index),
+    (3, "certificates.user_id index", lookup_indexes),
+    (4, "candidate change log", candidate_change_log),
+    (5, "certificate review", certificate_review),
+]
+
+def applied_versions(bind=engine):
+    with bind.connect() as conn:
+        if not inspect(conn).has_table("schema_migrations"):
+            return {}
+        rows = conn.execute(text("SELECT version, applied_at FROM schema_migrations"))
+        return {version: applied_at for version, applied_at in rows}
+
+def pending_migrations(bind=engine):
+    applied = applied_versions(bind)
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+def migrate(bind=engine):
+    """
+    Applies pending migrations in order, each in its own transaction. Returns the
+    versions this call applied.
+    """
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at FLOAT NOT NULL)"
+        ))
+    applied = []
+    for version, name, apply in pending_migrations(bind):
+        try:
+            with bind.begin() as conn:
+                apply(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": version, "n": name, "t": time.time()},
+                )
+        except IntegrityError:
+            continue  # another process recorded it first
+        applied.append(version)
+    return applied
+
+def ensure_schema(bind=engine):
+    """
+    Startup check: one cheap query when the schema is current. Applies what's missing
+    when AUTO_MIGRATE is on, otherwise refuses to start against an old schema.
+    """
+    pending = pending_migrations(bind)
+    if not pending:
+        return []
+    if not AUTO_MIGRATE:
+        names = ", ".join(f"{version} ({name})" for version, name, _ in pending)
+        raise RuntimeError(f"Database has pending migrations: {names}. Run `python migrations.py`.")
+    return migrate(bind)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending TRACE database migrations.")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying any")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        applied = applied_versions()
+        for version, name, _ in MIGRATIONS:
+            if version in applied:
+                state = "applied " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(applied[version]))
+            else:
+                state = "pending"
+            print(f"{version:>4}  {name:<32} {state}")
+        return 0
+
+    applied = migrate()
+    print(f"Applied {len(applied)} migration(s)" + (f": {', '.join(map(str, applied))}" if applied else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, Float, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -31,9 +31,44 @@ class Certificate(Base):
     __tablename__ = "certificates"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     filename = Column(String)
     description = Column(String)
     url = Column(String) # URL to access the file
+    issuers = Column(JSON, nullable=True)  # detected in the document, pending review
+    review_status = Column(String, nullable=True, index=True)  # pending, approved, rejected
 
     user = relationship("User", back_populates="certificates")
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    payload = Column(JSON, default={})
+    status = Column(String, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    progress = Column(Integer, default=0)  # 0-100
+    message = Column(String, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    run_after = Column(Float, default=0)  # epoch seconds; used for retry backoff
+    locked_at = Column(Float, nullable=True)
+    created_at = Column(Float)
+    updated_at = Column(Float)
+
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+# Profile writes, in order; every worker follows this log to refresh its copy of the corpus
+class CandidateChange(Base):
+    __tablename__ = "candidate_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    origin = Column(String)  # process that made the change; it has already applied it
+    changed_at = Column(Float, index=True)
+
+    # Ids must never be reused once old rows are pruned; workers track the last one they saw
+    __table_args__ = {"sqlite_autoincrement": True}
@@ -1,5 +1,9 @@
-from pydantic import BaseModel
-from typing import List, Optional
+import re
+
+from pydantic import BaseModel, Field, validator
+from typing import Any, List, Optional
+
+from uploads import sign_certificate_url
 
 class UserCreate(BaseModel):
     email: str
@@ -22,11 +26,20 @@ class CertificateBase(BaseModel):
 class CertificateCreate(CertificateBase):
     pass
 
+class CertificateReview(BaseModel):
+    approved: bool
+
 class Certificate(CertificateBase):
     id: int
     user_id: int
     filename: str
     url: str
+    issuers: Optional[List[str]] = None
+    review_status: Optional[str] = None
+
+    @validator("url")
+    def sign_url(cls, url):
+        return sign_certificate_url(url)
 
     class Config:
         orm_mode = True
@@ -45,6 +58,28 @@ class ProfileCreate(ProfileBase):
 class ProfileUpdate(ProfileBase):
     pass
 
+class ProfileImportRow(ProfileCreate):
+    """
+    One row of a bulk import. Without a password the account can't log in until one is set.
+    """
+    email: str
+    password: Optional[str] = None
+    is_verified: bool = False
+
+    @validator("email")
+    def email_shape(cls, email):
+        email = email.strip()
+        if "@" not in email or email.startswith("@") or email.endswith("@"):
+            raise ValueError("not a valid email address")
+        return email
+
+    @validator("skills", pre=True)
+    def split_skills(cls, skills):
+        # CSV cells carry skills as "React; Python" (or comma separated)
+        if isinstance(skills, str):
+            return [s.strip() for s in re.split(r"[;,|]", skills) if s.strip()]
+        return skills
+
 class Profile(ProfileBase):
     id: int
     user_id: int
@@ -52,12 +87,62 @@ class Profile(ProfileBase):
     class Config:
         orm_mode = True
 
-class User(BaseModel):
+class UserSummary(BaseModel):
+    """A user as other users see them: no contact details."""
     id: int
-    email: str
     is_verified: bool
     profile: Optional[Profile] = None
     certificates: List[Certificate] = []
 
     class Config:
         orm_mode = True
+
+class User(UserSummary):
+    email: str
+
+class ProfileSearchHit(Profile):
+    score: float
+
+class ProfileSearchResults(BaseModel):
+    results: List[ProfileSearchHit]
+    limit: int
+    offset: int
+    next_offset: Optional[int] = None
+
+class JobRequirements(BaseModel):
+    skills: List[str]
+    limit: int = Field(10, ge=0, le=100)
+
+class TeamRequest(BaseModel):
+    skills: List[str]
+    team_size: int = Field(3, ge=1, le=10)
+    verified_only: bool = False
+    min_score: int = Field(0, ge=0, le=100)
+    max_teams: int = Field(3, ge=1, le=10)
+    time_budget_ms: int = Field(300, ge=10, le=2000)
+
+class UserPage(BaseModel):
+    users: List[UserSummary]
+    next_after_id: Optional[int] = None
+
+class JobStatus(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    progress: int
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+class BulkImportError(BaseModel):
+    line: int
+    email: Optional[str] = None
+    error: str
+
+class BulkImportReport(BaseModel):
+    rows: int
+    created: int
+    failed: int
+    errors: List[BulkImportError]
+    elapsed_ms: int
@@ -0,0 +1,224 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict, defaultdict
+
+from ai_engine import SkillMatrix
+
+# Keeps "node.js", "c++" and "c#" as single tokens
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+# Per-field weights: a skill hit counts for more than a word in the bio
+FIELD_WEIGHTS = {"skills": 3.0, "role": 2.0, "name": 1.5, "bio": 0.5}
+PREFIX_MATCH_FACTOR = 0.5
+MIN_PREFIX_LENGTH = 2
+MAX_EXTERNAL_CANDIDATES = 10000
+
+def tokenize(text):
+    return [t.rstrip(".") for t in TOKEN_RE.findall((text or "").lower())]
+
+def candidate_terms(candidate):
+    """
+    Returns {token: weight} for a candidate dict, keeping the best field weight per token.
+    """
+    fields = {
+        "name": candidate.get("name"),
+        "role": candidate.get("role"),
+        "bio": candidate.get("bio"),
+        "skills": " ".join(candidate.get("skills") or []),
+    }
+    terms = {}
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            if token and terms.get(token, 0) < weight:
+                terms[token] = weight
+    return terms
+
+def profile_to_candidate(profile, user=None):
+    user = user or profile.user
+    name = profile.full_name or (user.email.split("@")[0] if user else "")
+    return {
+        "id": f"trace-{profile.user_id}",
+        "name": name,
+        "role": profile.role or "",
+        "verified": bool(user and user.is_verified),
+        "skills": list(profile.skills or []),
+        "bio": profile.bio or "",
+        "image": profile.image_url or f"https://api.dicebear.com/7.x/avataaars/svg?seed={name}",
+        "experience": profile.experience or "",
+        "source": "TRACE",
+    }
+
+class CandidateIndex:
+    """
+    Inverted index over the candidate corpus: token -> {doc key: weight}.
+    Documents are keyed by (source, id) and can be upserted or removed one at a time.
+    """
+    def __init__(self, max_external=MAX_EXTERNAL_CANDIDATES):
+        self.max_external = max_external
+        self._docs = {}
+        self._doc_terms = {}
+        self._postings = defaultdict(dict)
+        self._vocab = []  # sorted tokens, for prefix expansion
+        self._external = OrderedDict()
+        # Bumped on every write so derived structures know when to rebuild
+        self.generation = 0
+        self._matrix = None
+        # A shared, memory-mapped CandidateSnapshot; when set, skill_matrix() serves it
+        self.snapshot = None
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._docs)
+
+    def get(self, key):
+        return self._docs.get(key)
+
+    def subscribe(self, listener):
+        """
+        Registers an object with on_upsert(key, candidate) / on_remove(key) hooks,
+        for structures derived from the corpus that update incrementally.
+        """
+        self._listeners.append(listener)
+
+    def upsert(self, key, candidate):
+        self._unindex(key)
+        terms = candidate_terms(candidate)
+        self.generation += 1
+        self._docs[key] = candidate
+        self._doc_terms[key] = terms
+        for token, weight in terms.items():
+            posting = self._postings[token]
+            if not posting:
+                insort(self._vocab, token)
+            posting[key] = weight
+        for listener in self._listeners:
+            listener.on_upsert(key, candidate)
+
+    def remove(self, key):
+        self._external.pop(key, None)
+        if self._unindex(key):
+            for listener in self._listeners:
+                listener.on_remove(key)
+
+    def _unindex(self, key):
+        if self._docs.pop(key, None) is None:
+            return False
+        self.generation += 1
+        for token in self._doc_terms.pop(key, {}):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(key, None)
+            if not posting:
+                del self._postings[token]
+                i = bisect_left(self._vocab, token)
+                if i < len(self._vocab) and self._vocab[i] == token:
+                    del self._vocab[i]
+        return True
+
+    def upsert_profile(self, profile, user=None):
+        self.upsert(("profile", profile.user_id), profile_to_candidate(profile, user))
+
+    def load_profiles(self, db):
+        # Imported here so the index itself stays free of ORM dependencies
+        from sqlalchemy.orm import joinedload
+        import models
+
+        profiles = db.query(models.Profile).options(joinedload(models.Profile.user)).all()
+        for profile in profiles:
+            self.upsert_profile(profile)
+        return len(profiles)
+
+    def add_external(self, candidates, source="GitHub"):
+        """
+        Adds upstream search results to the corpus, bounded by max_external (oldest first out).
+        """
+        for candidate in candidates:
+            key = (source, candidate.get("id"))
+            self.upsert(key, candidate)
+            self._external[key] = None
+            self._external.move_to_end(key)
+        while len(self._external) > self.max_external:
+            oldest, _ = self._external.popitem(last=False)
+            self.remove(oldest)
+
+    def persistent_candidates(self):
+        """
+        (key, candidate) for every document except cached upstream results.
+        """
+        return [(key, c) for key, c in self._docs.items() if key not in self._external]
+
+    def skill_matrix(self):
+        """
+        Returns (candidates, SkillMatrix) over the whole corpus, rebuilt only after writes.
+        With a shared snapshot mapped, returns that instead: every worker's copy of the
+        built-in and profile candidates, current to within one sync interval. Cached
+        upstream results are left out on purpose in that mode: each worker caches its own,
+        so including them would make the same match or team request answer differently
+        depending on the worker. Search and semantic retrieval still return them.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.candidates, snapshot.matrix
+        if self._matrix is None or self._matrix[0] != self.generation:
+            candidates = list(self._docs.values())
+            matrix = SkillMatrix([c.get("skills") for c in candidates])
+            self._matrix = (self.generation, candidates, matrix)
+        return self._matrix[1], self._matrix[2]
+
+    def known_skills(self):
+        """
+        Every distinct skill name in the corpus, as first spelled.
+        """
+        skills = {}
+        # A copy, so it can run in a thread while the loop keeps writing
+        for candidate in list(self._docs.values()):
+            for skill in candidate.get("skills") or []:
+                if isinstance(skill, str):
+                    skills.setdefault(skill.lower(), skill)
+        return list(skills.values())
+
+    def _expand(self, term):
+        """
+        Yields (token, factor) for the exact term and every vocabulary token it prefixes.
+        """
+        i = bisect_left(self._vocab, term)
+        if len(term) < MIN_PREFIX_LENGTH:
+            if i < len(self._vocab) and self._vocab[i] == term:
+                yield term, 1.0
+            return
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            token = self._vocab[i]
+            yield token, 1.0 if token == term else PREFIX_MATCH_FACTOR
+            i += 1
+
+    def search(self, query, limit=20):
+        """
+        Returns candidates matching any query term, those matching the most terms first.
+        """
+        return [candidate for candidate, _, _ in self.search_scored(query, limit)]
+
+    def search_scored(self, query, limit=20):
+        """
+        Like search, but returns (candidate, query terms matched, relevance) tuples.
+        """
+        terms = set(tokenize(query))
+        matched = defaultdict(int)
+        scores = defaultdict(float)
+        for term in terms:
+            best = {}
+            for token, factor in self._expand(term):
+                for key, weight in self._postings[token].items():
+                    score = weight * factor
+                    if score > best.get(key, 0):
+                        best[key] = score
+            for key, score in best.items():
+                matched[key] += 1
+                scores[key] += score
+
+        ranked = heapq.nlargest(limit, scores, key=lambda k: (matched[k], scores[k]))
+        return [(self._docs[key], matched[key], scores[key]) for key in ranked]
+
+candidate_index = CandidateIndex()
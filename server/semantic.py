@@ -0,0 +1,479 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import zlib
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./vector_index")
+# Below this many vectors an exact scan is faster than probing an IVF index
+IVF_MIN_SIZE = int(os.getenv("IVF_MIN_SIZE", "4096"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_TRAIN_SAMPLE = 20000
+IVF_RETRAIN_GROWTH = 4
+
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+def candidate_text(candidate):
+    skills = " ".join(candidate.get("skills") or [])
+    # Skills are the strongest signal, so they are counted twice
+    return " ".join(filter(None, [candidate.get("role"), candidate.get("bio"), skills, skills]))
+
+class HashingEmbedder:
+    """
+    Local, CPU-only text embedding: signed feature hashing of words, word bigrams and
+    character trigrams into a fixed-size, L2-normalized float32 vector. No model download,
+    deterministic across processes, and similar wording ("react"/"reactjs") lands nearby.
+    """
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text):
+        words = WORD_RE.findall(text.lower())
+        for word in words:
+            yield word, 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+        for a, b in zip(words, words[1:]):
+            yield f"{a} {b}", 0.5
+
+    def embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode())
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+def spherical_kmeans(vectors, k, iterations=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[assignment == c]
+            if len(members):
+                mean = members.sum(axis=0)
+                norm = np.linalg.norm(mean)
+                if norm:
+                    centroids[c] = mean / norm
+    return centroids
+
+def cluster_rows(vectors, rows, sample, k):
+    """Returns (centroids, cluster of each row) for k clusters trained on sample."""
+    centroids = spherical_kmeans(sample, k)
+    clusters = [np.argmax(vectors[rows[start:start + 8192]] @ centroids.T, axis=1)
+                for start in range(0, len(rows), 8192)]
+    return centroids, np.concatenate(clusters) if clusters else np.empty(0, dtype=np.int64)
+
+class VectorIndex:
+    """
+    Persistent embedding store with approximate top-k retrieval.
+
+    Vectors live in a float32 memory-mapped matrix (one row per document, rows of deleted
+    documents are reused). Once the corpus reaches IVF_MIN_SIZE the rows are partitioned
+    into sqrt(n) clusters and queries only scan the IVF_NPROBE closest clusters.
+    Receives writes as a CandidateIndex listener, re-embedding only when the text changed.
+
+    One worker per host owns the files. The others map them copy-on-write and re-map once
+    the owner saves, so they only embed what the owner hasn't stored yet.
+    """
+    def __init__(self, path=VECTOR_INDEX_DIR, embedder=None, nprobe=IVF_NPROBE):
+        self.path = path
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = self.embedder.dim
+        self.nprobe = nprobe
+        self._vectors = None
+        self._capacity = 0
+        self._keys = {}  # document id -> CandidateIndex key, for ids seen this run
+        self._lock = None
+        self._readonly = False  # mapping another worker's files
+        self._local = {}        # document id -> text embedded here but not by the owner
+        self._shared_version = None
+        self._changes = 0
+        self._training = None  # future of a k-means run in progress
+        self._touched = None   # rows written while it runs; reassigned when it lands
+        self._reset()
+
+    def _reset(self):
+        self._ids = []      # row -> document id (None for free rows)
+        self._rows = {}     # document id -> row
+        self._hashes = {}   # document id -> hash of embedded text
+        self._free = []
+        self._centroids = None
+        self._assignment = []   # row -> cluster (-1 when untrained or free)
+        self._lists = []        # cluster -> set of rows
+        self._trained_size = 0
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _claim(self):
+        """
+        Takes the directory for this process. Only one worker on a host can own the
+        persisted vectors; the others follow it read-only.
+        """
+        if fcntl is None:
+            return True
+        self._lock = open(self._file("LOCK"), "a")
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            self._lock.close()
+            self._lock = None
+            return False
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        if not self._claim():
+            self._readonly = True
+            loaded = self._read_shared()
+            if loaded is not None:
+                self._adopt(loaded, prune=False)
+            self._ensure_capacity(1024)
+            return
+        meta_path = self._file("meta.json")
+        # A leftover dirty marker means the last run didn't save; start over rather than
+        # trust row mappings that may no longer match the vectors on disk
+        if os.path.exists(meta_path) and not os.path.exists(self._file("DIRTY")):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] == self.dim:
+                centroids = None
+                if os.path.exists(self._file("centroids.npy")):
+                    centroids = np.load(self._file("centroids.npy"))
+                self._load(meta, centroids)
+        else:
+            for name in ("meta.json", "centroids.npy", "vectors.f32"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+        # Headroom, so workers mapping the file rarely outgrow it (the extension is sparse)
+        self._ensure_capacity(max(2 * len(self._ids), 1024))
+
+    def _load(self, meta, centroids):
+        self._ids = meta["ids"]
+        self._hashes = meta["hashes"]
+        self._free = meta["free"]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if doc_id is not None}
+        self._trained_size = meta["trained_size"]
+        if centroids is None:
+            self._assignment = [-1] * len(self._ids)
+            return
+        self._centroids = centroids
+        self._assignment = meta["assignment"]
+        self._lists = [set() for _ in range(len(centroids))]
+        for row, cluster in enumerate(self._assignment):
+            if cluster >= 0:
+                self._lists[cluster].add(row)
+
+    def _read_shared(self):
+        """
+        Loads the owner's last save for a read-only worker: (version, meta, centroids,
+        copy-on-write vectors), or None if there isn't a complete one.
+        """
+        try:
+            version = os.stat(self._file("meta.json")).st_mtime_ns
+            with open(self._file("meta.json")) as f:
+                meta = json.load(f)
+            centroids = None
+            if meta.get("centroids_sha1"):
+                centroids = np.load(self._file("centroids.npy"))
+                # The owner may have saved newer ones since; pick them up with the next meta
+                if hashlib.sha1(centroids.tobytes()).hexdigest() != meta["centroids_sha1"]:
+                    return None
+            rows = os.path.getsize(self._file("vectors.f32")) // (self.dim * 4)
+            if meta["dim"] != self.dim or not rows or len(meta["ids"]) > rows:
+                return None
+            vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="c", shape=(rows, self.dim))
+        except (OSError, ValueError, KeyError):
+            return None
+        return version, meta, centroids, vectors
+
+    def _adopt(self, loaded, prune=True):
+        version, meta, centroids, vectors = loaded
+        # A k-means run over the old rows no longer applies
+        self._training = self._touched = None
+        self._reset()
+        self._load(meta, centroids)
+        self._vectors, self._capacity = vectors, len(vectors)
+        self._shared_version = version
+        # Writes the owner hasn't saved yet, and documents only this worker has
+        for doc_id, text in list(self._local.items()):
+            self.upsert(doc_id, text)
+        if prune:
+            self.prune_unseen()
+
+    async def sync(self):
+        """
+        Shares vectors between the workers on a host: the owner saves its changes, and
+        the others re-map its files once it has.
+        """
+        if not self._readonly:
+            if self._dirty:
+                await self.persist()
+            return
+        try:
+            version = os.stat(self._file("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if version != self._shared_version:
+            loaded = await run_in_threadpool(self._read_shared)
+            if loaded is not None:
+                self._adopt(loaded)
+
+    def close(self):
+        self._training = None
+        if self._vectors is not None:
+            self.save()
+            self._vectors = None
+            self._capacity = 0
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def _meta(self):
+        # Copies, so a thread can write them out while the index keeps changing
+        return {
+            "dim": self.dim,
+            "ids": list(self._ids),
+            "hashes": dict(self._hashes),
+            "free": list(self._free),
+            "assignment": list(self._assignment),
+            "trained_size": self._trained_size,
+        }
+
+    def _write(self, meta, centroids):
+        self._vectors.flush()
+        if centroids is not None:
+            meta["centroids_sha1"] = hashlib.sha1(centroids.tobytes()).hexdigest()
+            tmp = self._file("centroids.npy.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, centroids)
+            os.replace(tmp, self._file("centroids.npy"))
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def _clean(self):
+        if os.path.exists(self._file("DIRTY")):
+            os.remove(self._file("DIRTY"))
+        self._dirty = False
+
+    def save(self):
+        if self._readonly:
+            return
+        self._write(self._meta(), self._centroids)
+        self._clean()
+
+    async def persist(self):
+        """
+        save() with the file writes in a thread. Writes made meanwhile keep the index
+        marked dirty until the next one.
+        """
+        if self._readonly:
+            return
+        changes = self._changes
+        await run_in_threadpool(self._write, self._meta(), self._centroids)
+        if self._changes == changes:
+            self._clean()
+
+    def _mark_dirty(self):
+        self._changes += 1
+        if not self._dirty and not self._readonly:
+            open(self._file("DIRTY"), "w").close()
+        self._dirty = True
+
+    def _ensure_capacity(self, rows):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, 1024)
+        if self._readonly:
+            # The owner's file can't grow from here: use a private copy until the next re-map
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            if self._vectors is not None:
+                grown[:self._capacity] = self._vectors[:self._capacity]
+            self._vectors, self._capacity = grown, capacity
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def upsert(self, doc_id, text):
+        """
+        Embeds and stores text under doc_id. Returns False if it was already up to date.
+        """
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        if self._hashes.get(doc_id) == digest:
+            if self._readonly:
+                self._local.pop(doc_id, None)  # the owner has it
+            return False
+        if self._readonly:
+            self._local[doc_id] = text
+        self._mark_dirty()
+        row = self._rows.get(doc_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._ids)
+                self._ids.append(None)
+                self._assignment.append(-1)
+                self._ensure_capacity(row + 1)
+            self._ids[row] = doc_id
+            self._rows[doc_id] = row
+        vector = self.embedder.embed(text)
+        self._vectors[row] = vector
+        self._hashes[doc_id] = digest
+        self._assign(row, vector)
+        if self._touched is not None:
+            self._touched.add(row)
+
+        if len(self._rows) >= IVF_MIN_SIZE and self._training is None and (
+            self._centroids is None or len(self._rows) >= IVF_RETRAIN_GROWTH * self._trained_size
+        ):
+            self.train()
+        return True
+
+    def remove(self, doc_id):
+        self._local.pop(doc_id, None)
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        self._mark_dirty()
+        self._hashes.pop(doc_id, None)
+        self._ids[row] = None
+        self._unassign(row)
+        self._free.append(row)
+        if self._touched is not None:
+            self._touched.add(row)
+
+    def _assign(self, row, vector):
+        if self._centroids is None:
+            return
+        self._unassign(row)
+        cluster = int(np.argmax(self._centroids @ vector))
+        self._assignment[row] = cluster
+        self._lists[cluster].add(row)
+
+    def _unassign(self, row):
+        cluster = self._assignment[row]
+        if cluster >= 0:
+            self._lists[cluster].discard(row)
+            self._assignment[row] = -1
+
+    def _live_rows(self):
+        return np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+
+    def train(self):
+        """
+        (Re)builds the IVF clusters from a sample of the stored vectors. On the event loop
+        the k-means runs in a thread, and searches keep using the previous clusters (or an
+        exact scan) until it lands.
+        """
+        rows = self._live_rows()
+        k = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(0)
+        sample = rows if len(rows) <= IVF_TRAIN_SAMPLE else rng.choice(rows, IVF_TRAIN_SAMPLE, replace=False)
+        # A copy: rows may be rewritten while the thread clusters them
+        vectors = np.array(self._vectors[np.sort(sample)])
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._install(rows, *cluster_rows(self._vectors, rows, vectors, k))
+            return
+        self._touched = set()
+        self._training = loop.run_in_executor(None, cluster_rows, self._vectors, rows, vectors, k)
+        self._training.add_done_callback(lambda future: self._trained(future, rows))
+
+    def _trained(self, future, rows):
+        if future is not self._training:
+            return  # closed meanwhile
+        touched, self._touched, self._training = self._touched, None, None
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Vector index training failed: {future.exception()!r}")
+            return
+        self._install(rows, *future.result(), touched)
+
+    def _install(self, rows, centroids, clusters, touched=()):
+        self._centroids = centroids
+        self._lists = [set() for _ in range(len(centroids))]
+        self._assignment = [-1] * len(self._ids)
+        for row, cluster in zip(rows.tolist(), clusters.tolist()):
+            if row not in touched:
+                self._assignment[row] = cluster
+                self._lists[cluster].add(row)
+        # Written or freed while training ran: place them with the new centroids
+        for row in touched:
+            if self._ids[row] is not None:
+                self._assign(row, np.asarray(self._vectors[row]))
+        self._trained_size = len(rows)
+        self._mark_dirty()
+
+    def search(self, text, k=10):
+        """
+        Returns [(doc_id, cosine similarity)] for the k nearest documents, best first.
+        """
+        if not self._rows or k <= 0:
+            return []
+        query = self.embedder.embed(text)
+        if self._centroids is None:
+            rows = self._live_rows()
+        else:
+            nprobe = min(self.nprobe, len(self._centroids))
+            probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.fromiter((r for c in probes for r in self._lists[c]), dtype=np.int64)
+        if not len(rows):
+            return []
+        scores = self._vectors[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._ids[rows[i]], float(scores[i])) for i in top]
+
+    # CandidateIndex listener interface
+
+    @staticmethod
+    def doc_id(key):
+        return f"{key[0]}:{key[1]}"
+
+    def on_upsert(self, key, candidate):
+        doc_id = self.doc_id(key)
+        self._keys[doc_id] = key
+        self.upsert(doc_id, candidate_text(candidate))
+
+    def on_remove(self, key):
+        doc_id = self.doc_id(key)
+        self._keys.pop(doc_id, None)
+        self.remove(doc_id)
+
+    def prune_unseen(self):
+        """
+        Drops persisted documents that no longer exist in the corpus after a reload.
+        """
+        for doc_id in [d for d in self._rows if d not in self._keys]:
+            self.remove(doc_id)
+
+    def search_keys(self, text, k=10):
+        return [(self._keys[doc_id], score) for doc_id, score in self.search(text, k) if doc_id in self._keys]
+
+vector_index = VectorIndex()
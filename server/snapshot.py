@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+import uuid
+import numpy as np
+from sqlalchemy import func, insert
+from sqlalchemy.orm import joinedload
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows: no build lock, concurrent rebuilds are only wasted work
+    fcntl = None
+
+import models
+from ai_engine import SkillMatrix, SkillVocabulary
+from database import SessionLocal
+from search_index import candidate_index, profile_to_candidate
+from semantic import vector_index
+
+# Share one memory-mapped copy of the candidate matrix between the workers on a host.
+# On by default when uvicorn/gunicorn run more than one worker.
+CANDIDATE_SNAPSHOT = os.getenv(
+    "CANDIDATE_SNAPSHOT", "1" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "0"
+).lower() in ("1", "true", "yes")
+CANDIDATE_SNAPSHOT_PATH = os.getenv("CANDIDATE_SNAPSHOT_PATH", "./candidates.snap")
+# Upper bound on how long another worker's profile edit takes to show up here
+CANDIDATE_SYNC_SECONDS = float(os.getenv("CANDIDATE_SYNC_SECONDS", "2"))
+# Rebuilding the snapshot is O(corpus), so it happens at most this often per host; the
+# writes in between are batched into the next one
+CANDIDATE_REBUILD_SECONDS = float(os.getenv("CANDIDATE_REBUILD_SECONDS", "1"))
+CANDIDATE_CHANGE_RETENTION_SECONDS = float(os.getenv("CANDIDATE_CHANGE_RETENTION_SECONDS", "86400"))
+CHANGE_BATCH = 500
+
+SNAPSHOT_MAGIC = b"TRCSNAP1"
+SNAPSHOT_ALIGN = 64
+
+# Identifies this process in the change log, so it skips changes it made itself
+ORIGIN = uuid.uuid4().hex
+
+def record_changes(db, user_ids):
+    """
+    Logs profile writes in the caller's transaction, so they're visible to other workers
+    exactly when the profiles are.
+    """
+    now = time.time()
+    rows = [{"user_id": user_id, "origin": ORIGIN, "changed_at": now} for user_id in user_ids]
+    if rows:
+        db.execute(insert(models.CandidateChange), rows)
+
+def latest_change(session_factory=SessionLocal):
+    with session_factory() as db:
+        return db.query(func.max(models.CandidateChange.id)).scalar() or 0
+
+def read_changes(after, session_factory=SessionLocal):
+    """
+    Returns (latest change id, [(user_id, candidate or None if the profile is gone)]) for
+    changes after `after` made by other processes.
+    """
+    with session_factory() as db:
+        rows = (
+            db.query(models.CandidateChange.id, models.CandidateChange.user_id, models.CandidateChange.origin)
+            .filter(models.CandidateChange.id > after)
+            .order_by(models.CandidateChange.id)
+            .all()
+        )
+        if not rows:
+            return after, []
+        user_ids = list(dict.fromkeys(user_id for _, user_id, origin in rows if origin != ORIGIN))
+        found = {}
+        for i in range(0, len(user_ids), CHANGE_BATCH):
+            profiles = (
+                db.query(models.Profile)
+                .options(joinedload(models.Profile.user))
+                .filter(models.Profile.user_id.in_(user_ids[i:i + CHANGE_BATCH]))
+                .all()
+            )
+            for profile in profiles:
+                found[profile.user_id] = profile_to_candidate(profile)
+        return rows[-1][0], [(user_id, found.get(user_id)) for user_id in user_ids]
+
+def prune_changes(older_than, session_factory=SessionLocal):
+    # The newest row always stays: it's where workers starting up begin following the log
+    with session_factory() as db:
+        latest = db.query(func.max(models.CandidateChange.id)).scalar() or 0
+        db.query(models.CandidateChange).filter(
+            models.CandidateChange.changed_at < older_than, models.CandidateChange.id < latest
+        ).delete()
+        db.commit()
+
+def corpus_fingerprint(candidates):
+    """
+    Identifies the candidates that aren't in the change log (the built-in ones), so a
+    snapshot written by a different version of the corpus is rebuilt rather than trusted.
+    """
+    digest = hashlib.sha1(SNAPSHOT_MAGIC)
+    for candidate in candidates:
+        digest.update(json.dumps(candidate, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def _aligned(offset):
+    return -(-offset // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+def write_snapshot(path, generation, fingerprint, candidates):
+    """
+    Writes candidates as a snapshot file and atomically swaps it in at `path`. Workers
+    that still map the previous file keep reading it until they re-open.
+
+    Layout: magic, u32 header length, JSON header, then 64-byte aligned sections:
+    packed skill bitsets (rows x width), verified flags, document offsets and the
+    candidates as concatenated JSON.
+    """
+    matrix = SkillMatrix([c.get("skills") for c in candidates])
+    docs = [json.dumps(c, separators=(",", ":")).encode() for c in candidates]
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    np.cumsum([len(d) for d in docs], out=offsets[1:])
+    sections = [
+        ("bits", matrix.bits),
+        ("verified", np.fromiter((bool(c.get("verified")) for c in candidates), dtype=bool,
+                                 count=len(candidates))),
+        ("offsets", offsets),
+        ("docs", np.frombuffer(b"".join(docs), dtype=np.uint8)),
+    ]
+
+    header = {
+        "generation": generation,
+        "fingerprint": fingerprint,
+        "built_at": time.time(),
+        "rows": len(candidates),
+        "width": matrix.width,
+        "vocab": list(matrix.vocab.positions),
+        "sections": {},
+    }
+    # Header length depends on the offsets it holds; reserve room, then lay sections out
+    header_bytes = json.dumps(header).encode()
+    position = _aligned(len(SNAPSHOT_MAGIC) + 4 + len(header_bytes) + 64 * len(sections) + 256)
+    for name, array in sections:
+        header["sections"][name] = [position, array.nbytes]
+        position = _aligned(position + array.nbytes)
+    header_bytes = json.dumps(header).encode()
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for name, array in sections:
+            f.seek(header["sections"][name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(max(position, f.tell()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def read_header(path):
+    """Returns the snapshot header, or None if there's no usable snapshot at path."""
+    try:
+        with open(path, "rb") as f:
+            prefix = f.read(len(SNAPSHOT_MAGIC) + 4)
+            if len(prefix) < len(SNAPSHOT_MAGIC) + 4 or not prefix.startswith(SNAPSHOT_MAGIC):
+                return None
+            (length,) = struct.unpack("<I", prefix[len(SNAPSHOT_MAGIC):])
+            return json.loads(f.read(length))
+    except (OSError, ValueError):
+        return None
+
+class SnapshotCandidates:
+    """
+    Read-only sequence of candidate dicts, decoded from the mapped file on access.
+    """
+    def __init__(self, docs, offsets, verified):
+        self._docs = docs
+        self._offsets = offsets
+        # Lets team formation filter on verification without decoding every document
+        self.verified = verified
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return json.loads(self._docs[self._offsets[i]:self._offsets[i + 1]].tobytes())
+
+class CandidateSnapshot:
+    """
+    A snapshot file mapped read-only. The arrays point straight into the mapping, so every
+    worker that opens the same file shares one copy in the page cache.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (length,) = struct.unpack_from("<I", self._map, len(SNAPSHOT_MAGIC))
+        start = len(SNAPSHOT_MAGIC) + 4
+        header = json.loads(self._map[start:start + length])
+        self.generation = header["generation"]
+        self.fingerprint = header["fingerprint"]
+        self.built_at = header["built_at"]
+        rows, width = header["rows"], header["width"]
+
+        def section(name, dtype):
+            offset, size = header["sections"][name]
+            if size == 0:
+                return np.zeros(0, dtype=dtype)
+            return np.frombuffer(self._map, dtype=dtype, count=size // np.dtype(dtype).itemsize, offset=offset)
+
+        bits = section("bits", np.uint8).reshape(rows, width)
+        self.matrix = SkillMatrix.from_bits(bits, SkillVocabulary(header["vocab"]))
+        self.candidates = SnapshotCandidates(section("docs", np.uint8), section("offsets", np.int64),
+                                             section("verified", bool))
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def same_file(self, stat):
+        return (self.stat.st_ino, self.stat.st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns)
+
+class CandidateSync:
+    """
+    Keeps this worker's candidate data current with every other process on the host.
+
+    Profile writes land in the candidate_changes table; each worker polls it and re-reads
+    the profiles others changed into its own index. With CANDIDATE_SNAPSHOT on, one worker
+    at a time also rebuilds the shared snapshot once it lags the log, and the rest re-map
+    it; CandidateIndex.skill_matrix() then serves the mapped copy. Every sync also shares
+    the vector index: its owner saves, and the other workers re-map what it saved.
+    """
+    def __init__(self, index=candidate_index, path=CANDIDATE_SNAPSHOT_PATH, shared=CANDIDATE_SNAPSHOT,
+                 interval=CANDIDATE_SYNC_SECONDS, rebuild_interval=CANDIDATE_REBUILD_SECONDS,
+                 vectors=vector_index, session_factory=SessionLocal):
+        self.index = index
+        self.path = path
+        self.shared = shared
+        self.interval = interval
+        self.rebuild_interval = rebuild_interval
+        self.vectors = vectors
+        self.session_factory = session_factory
+        self.seen = 0
+        self.fingerprint = None
+        self.applied = 0
+        self.rebuilds = 0
+        self._task = None
+
+    def mark_loaded(self, seen):
+        """Records the change id the index was loaded at; later changes are applied on sync."""
+        self.seen = seen
+
+    async def start(self):
+        built_in = (c for key, c in self.index.persistent_candidates() if key[0] != "profile")
+        self.fingerprint = corpus_fingerprint(built_in)
+        if self.shared:
+            # Blocks until whichever worker got here first has built it
+            await run_in_threadpool(self._refresh, self.seen, self.index.persistent_candidates(), True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        # Local writes are in this worker's index at once; they reach the snapshot and the
+        # other workers with the next sync, together with whatever else changed meanwhile
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"Candidate sync failed: {e!r}")
+            await asyncio.sleep(self.interval)
+
+    async def sync(self):
+        latest, changes = await run_in_threadpool(read_changes, self.seen, self.session_factory)
+        # The index is only ever written on the event loop
+        for user_id, candidate in changes:
+            if candidate is None:
+                self.index.remove(("profile", user_id))
+            else:
+                self.index.upsert(("profile", user_id), candidate)
+        self.applied += len(changes)
+        self.seen = latest
+        if self.shared:
+            snapshot = self.index.snapshot
+            if snapshot is None or (snapshot.generation, snapshot.fingerprint) != (latest, self.fingerprint):
+                if snapshot is None or time.time() - snapshot.built_at >= self.rebuild_interval:
+                    await run_in_threadpool(self._refresh, latest, self.index.persistent_candidates(), False)
+        if self.vectors is not None:
+            await self.vectors.sync()
+
+    def _open_current(self, generation):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        snapshot = self.index.snapshot
+        if snapshot is None or not snapshot.same_file(stat):
+            header = read_header(self.path)
+            if header is None or (header["generation"], header["fingerprint"]) != (generation, self.fingerprint):
+                return False
+            self.index.snapshot = CandidateSnapshot(self.path)
+        return self.index.snapshot.generation == generation
+
+    def _refresh(self, generation, candidates, wait):
+        """
+        Maps the snapshot for `generation`, building it first if this worker gets the build
+        lock. Without `wait`, a worker that finds a build in progress picks it up next sync.
+        """
+        if self._open_current(generation):
+            return
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return
+            # Someone may have built it while we waited for the lock
+            if self._open_current(generation):
+                return
+            header = read_header(self.path)
+            if header is not None and header["fingerprint"] == self.fingerprint and (
+                header["generation"] > generation
+                or (not wait and time.time() - header["built_at"] < self.rebuild_interval)
+            ):
+                # A newer or recent one is in place; serve it and catch up on a later sync
+                snapshot = self.index.snapshot
+                if snapshot is None or not snapshot.same_file(os.stat(self.path)):
+                    self.index.snapshot = CandidateSnapshot(self.path)
+                return
+            write_snapshot(self.path, generation, self.fingerprint, [c for _, c in candidates])
+            self.rebuilds += 1
+            self.index.snapshot = CandidateSnapshot(self.path)
+        prune_changes(time.time() - CANDIDATE_CHANGE_RETENTION_SECONDS, self.session_factory)
+
+    def stats(self):
+        snapshot = self.index.snapshot
+        return {
+            "shared": self.shared,
+            "seen_change": self.seen,
+            "applied": self.applied,
+            "rebuilds": self.rebuilds,
+            "snapshot_generation": snapshot.generation if snapshot else None,
+            "snapshot_rows": len(snapshot) if snapshot else None,
+            "snapshot_age_seconds": round(time.time() - snapshot.built_at, 3) if snapshot else None,
+        }
+
+candidate_sync = CandidateSync()
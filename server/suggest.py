@@ -0,0 +1,143 @@
+import heapq
+import os
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+# Earlier kinds win ties on frequency
+SUGGESTION_KINDS = ("skill", "role", "name")
+MAX_PHRASE_LENGTH = 80
+# Ranked results memoized per prefix; a write only drops the prefixes it can affect
+SUGGEST_CACHE_SIZE = int(os.getenv("SUGGEST_CACHE_SIZE", "10000"))
+
+WORD_START_RE = re.compile(r"(?:^|(?<=[\s/(-]))\S")
+
+def normalize_phrase(text):
+    return " ".join(str(text).lower().split())
+
+def candidate_phrases(candidate):
+    """
+    The (kind, text) pairs a candidate contributes to suggestions.
+    """
+    phrases = set()
+    for skill in candidate.get("skills") or []:
+        if isinstance(skill, str) and skill.strip():
+            phrases.add(("skill", skill.strip()))
+    for kind, field in (("role", "role"), ("name", "name")):
+        value = candidate.get(field)
+        if isinstance(value, str) and value.strip():
+            phrases.add((kind, " ".join(value.split())))
+    return {(kind, text[:MAX_PHRASE_LENGTH]) for kind, text in phrases}
+
+class SuggestionIndex:
+    """
+    Typeahead over skills, roles and names in the candidate corpus, ranked by how many
+    candidates use each phrase. Phrases are findable from the start of any word
+    ("chen" finds "Sarah Chen") through a sorted array of (word-start key, phrase),
+    kept current through the CandidateIndex listener hooks.
+    """
+    def __init__(self, cache_size=SUGGEST_CACHE_SIZE):
+        self._phrases = {}   # (kind, normalized) -> [display text, count]
+        self._keys = []      # sorted (key, kind, normalized)
+        self._doc_phrases = {}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # prefix -> {(limit, kinds): results}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._phrases)
+
+    @staticmethod
+    def _word_keys(normalized):
+        return [normalized[m.start():] for m in WORD_START_RE.finditer(normalized)]
+
+    def _invalidate(self, keys):
+        for key in keys:
+            for end in range(1, len(key) + 1):
+                self._cache.pop(key[:end], None)
+
+    def _add(self, kind, text):
+        phrase = (kind, normalize_phrase(text))
+        keys = self._word_keys(phrase[1])
+        self._invalidate(keys)
+        entry = self._phrases.get(phrase)
+        if entry is not None:
+            entry[1] += 1
+            return
+        self._phrases[phrase] = [text, 1]
+        for key in keys:
+            insort(self._keys, (key, kind, phrase[1]))
+
+    def _discard(self, kind, text):
+        phrase = (kind, normalize_phrase(text))
+        entry = self._phrases.get(phrase)
+        if entry is None:
+            return
+        keys = self._word_keys(phrase[1])
+        self._invalidate(keys)
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del self._phrases[phrase]
+        for key in keys:
+            item = (key, kind, phrase[1])
+            i = bisect_left(self._keys, item)
+            if i < len(self._keys) and self._keys[i] == item:
+                del self._keys[i]
+
+    def on_upsert(self, key, candidate):
+        phrases = candidate_phrases(candidate)
+        previous = self._doc_phrases.get(key, set())
+        if phrases == previous:
+            return
+        for kind, text in previous - phrases:
+            self._discard(kind, text)
+        for kind, text in phrases - previous:
+            self._add(kind, text)
+        self._doc_phrases[key] = phrases
+
+    def on_remove(self, key):
+        for kind, text in self._doc_phrases.pop(key, ()):
+            self._discard(kind, text)
+
+    def suggest(self, prefix, limit=8, kinds=None):
+        """
+        Returns up to `limit` {"text", "kind", "count"} whose words start with prefix,
+        most frequent first.
+        """
+        prefix = normalize_phrase(prefix)
+        if not prefix:
+            return []
+        cached = self._cache.get(prefix)
+        if cached is not None and (limit, kinds) in cached:
+            self._cache.move_to_end(prefix)
+            self.hits += 1
+            return cached[(limit, kinds)]
+        self.misses += 1
+
+        # One phrase can match through several of its words; count it once
+        matches = set()
+        i = bisect_left(self._keys, (prefix,))
+        while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+            _, kind, normalized = self._keys[i]
+            if kinds is None or kind in kinds:
+                matches.add((kind, normalized))
+            i += 1
+
+        def rank(phrase):
+            text, count = self._phrases[phrase]
+            # Frequency, then phrases that start with the prefix, then the shorter one
+            return (-count, not phrase[1].startswith(prefix), SUGGESTION_KINDS.index(phrase[0]), len(text), text)
+
+        results = [
+            {"text": self._phrases[p][0], "kind": p[0], "count": self._phrases[p][1]}
+            for p in heapq.nsmallest(limit, matches, key=rank)
+        ]
+        self._cache.setdefault(prefix, {})[(limit, kinds)] = results
+        self._cache.move_to_end(prefix)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return results
+
+suggestion_index = SuggestionIndex()
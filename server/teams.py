@@ -0,0 +1,146 @@
+import heapq
+import time
+from itertools import combinations
+from math import comb
+import numpy as np
+
+from ai_engine import POPCOUNT8, normalize_skill, score_from_matches
+
+MAX_REQUIRED_SKILLS = 62   # required-skill masks are packed into int64
+EXACT_SEARCH_LIMIT = 20000  # enumerate every team when there are at most this many
+BEAM_WIDTH = 64
+BEAM_BRANCH = 16
+
+def popcount64(values):
+    values = np.ascontiguousarray(values, dtype=np.int64)
+    return POPCOUNT8[values.view(np.uint8).reshape(-1, 8)].sum(axis=1, dtype=np.int64)
+
+def required_masks(matrix, skills):
+    """
+    Projects every candidate onto the required skills: bit j set if they have skills[j].
+    """
+    masks = np.zeros(len(matrix), dtype=np.int64)
+    for j, skill in enumerate(skills):
+        position = matrix.vocab.positions.get(skill)
+        if position is None:
+            continue
+        column = (matrix.bits[:, position >> 3] >> (7 - (position & 7))) & 1
+        masks |= column.astype(np.int64) << j
+    return masks
+
+def _team_key(covered, total):
+    return (bin(covered).count("1"), total)
+
+def _exact(masks, scores, size):
+    best = []
+    for team in combinations(range(len(masks)), size):
+        covered = 0
+        for i in team:
+            covered |= int(masks[i])
+        best.append((_team_key(covered, sum(int(scores[i]) for i in team)), team))
+    return best
+
+def _beam(masks, scores, size, deadline, width):
+    """
+    Returns only complete teams of `size`. Without a deadline (the greedy pass, which is
+    O(size * n)) it always finishes; a pass cut short by the deadline returns nothing.
+    """
+    states = [(_team_key(0, 0), 0, ())]
+    for _ in range(size):
+        expanded = {}
+        for _, covered, team in states:
+            gain = popcount64(masks & ~covered)
+            gain[list(team)] = -1
+            # Only the most promising additions: new skills covered first, then score
+            order = np.lexsort((-scores, -gain))[:BEAM_BRANCH]
+            for i in order:
+                if gain[i] < 0:
+                    continue
+                members = tuple(sorted(team + (int(i),)))
+                if members not in expanded:
+                    new_covered = covered | int(masks[i])
+                    total = sum(int(scores[m]) for m in members)
+                    expanded[members] = (_team_key(new_covered, total), new_covered, members)
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        if not expanded:
+            break
+        states = heapq.nlargest(width, expanded.values())
+        if deadline is not None and time.monotonic() > deadline:
+            break
+    return [(key, team) for key, _, team in states if len(team) == size]
+
+def form_teams(candidates, matrix, skills, team_size=3, verified_only=False, min_score=0,
+               max_teams=3, time_budget=0.3):
+    """
+    Assembles up to max_teams teams of team_size that cover as many of `skills` as possible,
+    breaking ties on the members' combined match score.
+
+    Candidates are reduced to their required-skill bitmask first and only the best
+    team_size people per distinct mask are kept, so the search space depends on how many
+    skill combinations exist rather than on the pool size. Small spaces are searched
+    exhaustively; larger ones use beam search (greedy when width is 1) within time_budget.
+    """
+    started = time.monotonic()
+    deadline = started + time_budget
+    required = list(dict.fromkeys(normalize_skill(s) for s in skills))[:MAX_REQUIRED_SKILLS]
+
+    masks = required_masks(matrix, required)
+    counts = popcount64(masks)
+    scores = score_from_matches(counts, len(required))
+    eligible = (masks != 0) & (scores >= min_score)
+    if verified_only:
+        verified = getattr(candidates, "verified", None)  # snapshots carry the flags as an array
+        if verified is None:
+            verified = np.fromiter((bool(c.get("verified")) for c in candidates), dtype=bool, count=len(candidates))
+        eligible &= verified
+    pool = np.flatnonzero(eligible)
+
+    # Best team_size candidates for every distinct skill mask
+    order = pool[np.lexsort((-scores[pool], masks[pool]))]
+    keep = []
+    previous, taken = None, 0
+    for i in order:
+        mask = masks[i]
+        taken = taken + 1 if mask == previous else 1
+        previous = mask
+        if taken <= team_size:
+            keep.append(i)
+    reps = np.asarray(keep, dtype=np.int64)
+    rep_masks, rep_scores = masks[reps], scores[reps]
+
+    size = min(team_size, len(reps))
+    if size == 0:
+        teams = []
+    elif comb(len(reps), size) <= EXACT_SEARCH_LIMIT:
+        teams = _exact(rep_masks, rep_scores, size)
+    else:
+        teams = _beam(rep_masks, rep_scores, size, None, width=1)
+        if time.monotonic() < deadline:
+            teams += _beam(rep_masks, rep_scores, size, deadline, width=BEAM_WIDTH)
+
+    results, seen = [], set()
+    for (covered_count, total), team in heapq.nlargest(len(teams), teams):
+        if team in seen:
+            continue
+        seen.add(team)
+        covered = 0
+        for i in team:
+            covered |= int(rep_masks[i])
+        results.append({
+            "members": [
+                {**candidates[reps[i]], "match_score": int(rep_scores[i])} for i in team
+            ],
+            "covered_skills": [s for j, s in enumerate(required) if covered >> j & 1],
+            "missing_skills": [s for j, s in enumerate(required) if not covered >> j & 1],
+            "coverage": round(covered_count / len(required), 4) if required else 0.0,
+            "score": total,
+        })
+        if len(results) >= max_teams:
+            break
+
+    return {
+        "teams": results,
+        "pool_size": int(len(pool)),
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 2),
+    }
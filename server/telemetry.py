@@ -0,0 +1,413 @@
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Seconds; fine-grained at the low end, where SQLite queries and cache hits land
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Clients opt in per request with "X-Server-Timing: 1"; SERVER_TIMING=0 turns that off
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1").lower() in ("1", "true", "yes")
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+# A forgotten profiler stops by itself
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "CREATE", "BEGIN", "COMMIT", "ROLLBACK"}
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_sample(name, labels, value):
+    if labels:
+        rendered = ",".join(f'{key}="{escape_label(v)}"' for key, v in labels.items())
+        name = f"{name}{{{rendered}}}"
+    return f"{name} {value:g}" if isinstance(value, float) else f"{name} {value}"
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def samples(self):
+        """Yields (name, labels dict, value) in exposition order."""
+        raise NotImplementedError
+
+class CounterMetric(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labels, key)), value
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        self.observe_key(self._key(labels), value)
+
+    def observe_key(self, key, value):
+        """observe() with the label values tuple already built, for hot paths."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*s[0]], s[1], s[2])) for key, s in self._values.items())
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                yield f"{self.name}_bucket", {**labels, "le": f"{bound:g}" if bound != "+Inf" else bound}, cumulative
+            yield f"{self.name}_sum", labels, float(total)
+            yield f"{self.name}_count", labels, count
+
+class CallbackMetric(Metric):
+    """
+    Read at scrape time from counters the app keeps anyway. fn returns a number,
+    or {label values tuple: number}.
+    """
+    def __init__(self, name, help, fn, labels=(), type="gauge"):
+        super().__init__(name, help, labels)
+        self.fn = fn
+        self.type = type
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e!r}")
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, key)), value
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(CounterMetric(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, fn, labels=()):
+        return self._register(CallbackMetric(name, help, fn, labels))
+
+    def callback_counter(self, name, help, fn, labels=()):
+        return self._register(CallbackMetric(name, help, fn, labels, type="counter"))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(format_sample(*sample) for sample in metric.samples())
+        return "\n".join(lines) + "\n"
+
+metrics = Registry()
+
+http_requests = metrics.counter(
+    "trace_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+http_seconds = metrics.histogram(
+    "trace_http_request_seconds", "Time to serve a request, including streamed bodies.", ("method", "route"))
+http_queries = metrics.histogram(
+    "trace_http_request_db_queries", "SQL statements issued per request.", ("route",), QUERY_COUNT_BUCKETS)
+stage_seconds = metrics.histogram(
+    "trace_stage_seconds", "Time spent per instrumented stage.", ("stage",))
+db_queries = metrics.counter(
+    "trace_db_queries_total", "SQL statements executed.", ("operation",))
+db_query_seconds = metrics.histogram(
+    "trace_db_query_seconds", "SQL statement execution time.", ("operation",))
+db_session_seconds = metrics.histogram(
+    "trace_db_session_seconds", "How long request-scoped sessions stay open.")
+upstream_requests = metrics.counter(
+    "trace_upstream_requests_total", "Upstream HTTP responses by host and status code.", ("host", "status"))
+upstream_seconds = metrics.histogram(
+    "trace_upstream_request_seconds", "Upstream time to response headers.", ("host",))
+
+_caches = {}
+
+def _cache_lookups():
+    values = {}
+    for name, fn in _caches.items():
+        hits, misses = fn()
+        values[(name, "hit")] = hits
+        values[(name, "miss")] = misses
+    return values
+
+def _cache_ratios():
+    ratios = {}
+    for name, fn in _caches.items():
+        hits, misses = fn()
+        ratios[(name,)] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+    return ratios
+
+metrics.callback_counter(
+    "trace_cache_lookups_total", "Cache lookups by cache and result.", _cache_lookups, ("cache", "result"))
+metrics.gauge("trace_cache_hit_ratio", "Hits over lookups since start, per cache.", _cache_ratios, ("cache",))
+
+def register_cache(name, fn):
+    """Exposes a cache's hit ratio; fn returns (hits, misses) from its own counters."""
+    _caches[name] = fn
+
+class RequestTrace:
+    """
+    Per-request stage timings, gathered from whichever thread or task does the work.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # name -> [seconds, calls]
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self):
+        parts = []
+        with self._lock:
+            stages = sorted(self.stages.items())
+        for name, (seconds, calls) in stages:
+            parts.append(f'{name};dur={seconds * 1000:.2f};desc="{calls}x"')
+        if self.queries:
+            parts.append(f'db_queries;desc="{self.queries}"')
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+_current = contextvars.ContextVar("request_trace", default=None)
+
+def current_trace():
+    return _current.get()
+
+def record(name, seconds):
+    stage_seconds.observe_key((name,), seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+def timed(name):
+    """Decorator recording each call of a sync or async function as a stage."""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    record(name, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+class TracingMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template. Stages recorded while
+    the request runs land in its trace, returned as a Server-Timing header on request.
+    For streamed responses the header reflects the work done before the first byte.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = RequestTrace()
+        token = _current.set(trace)
+        wants_timing = SERVER_TIMING and any(
+            name == b"x-server-timing" and value not in (b"", b"0") for name, value in scope["headers"]
+        )
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_timing:
+                    headers = [*message.get("headers", []), (b"server-timing", trace.server_timing().encode())]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - trace.started
+            # Templates, not raw paths, so ids don't explode label cardinality
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_requests.inc(method=scope["method"], route=route, status=status)
+            http_seconds.observe(elapsed, method=scope["method"], route=route)
+            http_queries.observe(trace.queries, route=route)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context._telemetry_started = time.perf_counter()
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._telemetry_started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    operation = operation if operation in SQL_OPERATIONS else "OTHER"
+    db_queries.inc(operation=operation)
+    db_query_seconds.observe(elapsed, operation=operation)
+    trace = _current.get()
+    if trace is not None:
+        trace.add("db", elapsed)
+        with trace._lock:
+            trace.queries += 1
+
+def instrument_engine(engine):
+    """Counts and times every statement an engine sends (pass sync_engine for async engines)."""
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+async def _on_upstream_request(request):
+    request.extensions["telemetry_started"] = time.perf_counter()
+
+async def _on_upstream_response(response):
+    request = response.request
+    started = request.extensions.get("telemetry_started")
+    upstream_requests.inc(host=request.url.host, status=response.status_code)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        upstream_seconds.observe(elapsed, host=request.url.host)
+        trace = _current.get()
+        if trace is not None:
+            trace.add("upstream", elapsed)
+
+# httpx event_hooks for clients whose calls should be counted as upstream time
+UPSTREAM_EVENT_HOOKS = {"request": [_on_upstream_request], "response": [_on_upstream_response]}
+
+class SamplingProfiler:
+    """
+    Low-overhead sampling of every thread's Python stack, for flame graphs of a live
+    worker. Off until started; output is folded stacks ("a;b;c count"), which
+    flamegraph.pl and speedscope read directly.
+    """
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = PROFILER_INTERVAL_MS / 1000
+        self.started_at = None
+        self.stopped_at = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=PROFILER_INTERVAL_MS, seconds=PROFILER_MAX_SECONDS):
+        """Starts a fresh capture; returns False if one is already running."""
+        if self.running:
+            return False
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = max(1.0, interval_ms) / 1000
+        self.started_at, self.stopped_at = time.time(), None
+        self._stop.clear()
+        deadline = time.monotonic() + min(seconds, PROFILER_MAX_SECONDS)
+        self._thread = threading.Thread(target=self._run, args=(deadline,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        return True
+
+    def _run(self, deadline):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.stopped_at = time.time()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+profiler = SamplingProfiler()
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# The server modules import each other as top-level modules, as under `uvicorn main:app`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Everything the app writes goes to a scratch directory, never the working tree
+_scratch = tempfile.mkdtemp(prefix="trace-tests-")
+for name, value in {
+    "DATABASE_URL": f"sqlite:///{os.path.join(_scratch, 'trace.db')}",
+    "UPLOAD_DIR": os.path.join(_scratch, "uploads"),
+    "VECTOR_INDEX_DIR": os.path.join(_scratch, "vector_index"),
+    "SEARCH_CACHE_PATH": os.path.join(_scratch, "search_cache.db"),
+    "GITHUB_CACHE_PATH": os.path.join(_scratch, "github_cache.db"),
+    "CANDIDATE_SNAPSHOT_PATH": os.path.join(_scratch, "candidates.snap"),
+    "JOB_BACKEND": "memory",
+    "BCRYPT_ROUNDS": "4",
+}.items():
+    os.environ.setdefault(name, value)
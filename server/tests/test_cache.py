@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import cache
+from cache import MemoryBackend, SearchCache, SQLiteBackend
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(max_entries=100):
+        if request.param == "memory":
+            return MemoryBackend(max_entries)
+        return SQLiteBackend(str(tmp_path / "search_cache.db"), max_entries)
+    return make
+
+def run(coro):
+    return asyncio.run(coro)
+
+def fetcher(calls, delay=0):
+    async def fetch(query):
+        calls.append(query)
+        await asyncio.sleep(delay)
+        return [f"result for {query}"]
+    return fetch
+
+def test_entries_expire_after_ttl(make_backend, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    search = SearchCache(make_backend(), ttl=60)
+    calls = []
+
+    async def scenario():
+        await search.get_or_fetch("React", fetcher(calls))
+        now[0] += 59
+        await search.get_or_fetch(" react ", fetcher(calls))
+        now[0] += 2
+        await search.get_or_fetch("react", fetcher(calls))
+
+    run(scenario())
+    assert calls == ["React", "react"]
+    assert (search.hits, search.misses) == (1, 2)
+
+def test_least_recently_used_entry_is_evicted(make_backend):
+    backend = make_backend(max_entries=2)
+    search = SearchCache(backend)
+    calls = []
+
+    async def scenario():
+        for query in ("a", "b", "a", "c"):  # "a" was used after "b", so "b" goes
+            await search.get_or_fetch(query, fetcher(calls))
+        await search.get_or_fetch("a", fetcher(calls))
+        await search.get_or_fetch("b", fetcher(calls))
+
+    run(scenario())
+    assert calls == ["a", "b", "c", "b"]
+    assert backend.evictions == 2
+    assert len(backend) == 2
+
+def test_concurrent_misses_share_one_fetch(make_backend):
+    search = SearchCache(make_backend())
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*(search.get_or_fetch("Python", fetcher(calls, delay=0.05)) for _ in range(10)))
+
+    results = run(scenario())
+    assert calls == ["Python"]
+    assert results == [["result for Python"]] * 10
+    assert (search.misses, search.coalesced) == (1, 9)
+    assert search.stats()["entries"] == 1
+
+def test_sqlite_backends_on_one_file_share_entries(tmp_path):
+    path = str(tmp_path / "search_cache.db")
+    first = SearchCache(SQLiteBackend(path))
+    second = SearchCache(SQLiteBackend(path))
+    calls = []
+
+    async def scenario():
+        await first.get_or_fetch("golang", fetcher(calls))
+        value = await second.get_or_fetch("golang", fetcher(calls))
+        await second.invalidate("golang")
+        await first.get_or_fetch("golang", fetcher(calls))
+        return value
+
+    assert run(scenario()) == ["result for golang"]
+    assert calls == ["golang", "golang"]
+    assert (second.hits, second.misses) == (1, 0)
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import github_client
+from github_client import GitHubClient, RateLimited, TokenBucket
+
+class MockGitHub(BaseHTTPRequestHandler):
+    """
+    Serves /users/<login> with an ETag and X-RateLimit-* headers, answering matching
+    If-None-Match requests with a 304 the way GitHub does.
+    """
+    def do_GET(self):
+        state = self.server.state
+        state["requests"].append({"path": self.path, "if_none_match": self.headers.get("If-None-Match")})
+        login = self.path.rsplit("/", 1)[1]
+        etag = f'"{login}-{state["version"]}"'
+        headers = {"ETag": etag, "X-RateLimit-Resource": "core", "X-RateLimit-Limit": "60",
+                   "X-RateLimit-Remaining": str(state["remaining"]), "X-RateLimit-Reset": str(int(time.time()) + 3600)}
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, headers)
+            return
+        body = json.dumps({"login": login, "version": state["version"]}).encode()
+        self._send(200, {**headers, "Content-Type": "application/json"}, body)
+
+    def _send(self, status, headers, body=b""):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockGitHub)
+    server.state = {"version": 1, "remaining": 50, "requests": []}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def github(upstream, tmp_path):
+    http = httpx.AsyncClient()
+
+    async def client_factory():
+        return http
+
+    host, port = upstream.server_address
+    client = GitHubClient(client_factory, cache_path=str(tmp_path / "github_cache.db"),
+                          base_url=f"http://{host}:{port}", token="")
+    yield client
+    asyncio.run(client.close())
+    asyncio.run(http.aclose())
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_revalidates_with_etag_and_304_spends_no_token(github, upstream, monkeypatch):
+    monkeypatch.setattr(github_client, "GITHUB_CACHE_FRESH_SECONDS", 0)
+    monkeypatch.setattr(github_client, "GITHUB_CACHE_SWR_SECONDS", 0)
+    bucket = github.buckets["core"] = TokenBucket(rate=1e-6, capacity=5)
+
+    async def scenario():
+        first = await github.get_json("/users/octocat")
+        tokens = bucket.tokens
+        second = await github.get_json("/users/octocat")
+        return first, tokens, second
+
+    first, tokens, second = run(scenario())
+    assert first == second == {"login": "octocat", "version": 1}
+    assert upstream.state["requests"][1]["if_none_match"] == '"octocat-1"'
+    assert github.counters["fetched"] == 1
+    assert github.counters["revalidated"] == 1
+    assert bucket.tokens == pytest.approx(tokens, abs=1e-3)
+
+def test_exhausted_bucket_raises_without_calling_upstream(github, upstream, monkeypatch):
+    monkeypatch.setattr(github_client, "GITHUB_MAX_WAIT", 0)
+    github.buckets["core"] = TokenBucket(rate=1e-6, capacity=2)
+
+    async def scenario():
+        await github.get_json("/users/a")
+        await github.get_json("/users/b")
+        with pytest.raises(RateLimited):
+            await github.get_json("/users/c")
+
+    run(scenario())
+    assert [r["path"] for r in upstream.state["requests"]] == ["/users/a", "/users/b"]
+    assert github.counters["throttled"] == 1
+
+def test_exhausted_quota_serves_stale(github, upstream, monkeypatch):
+    upstream.state["remaining"] = 0
+
+    async def scenario():
+        first = await github.get_json("/users/octocat")
+        # Past revalidation age, but the cached body beats an error
+        monkeypatch.setattr(github_client, "GITHUB_CACHE_FRESH_SECONDS", 0)
+        monkeypatch.setattr(github_client, "GITHUB_CACHE_SWR_SECONDS", 0)
+        stale = await github.get_json("/users/octocat")
+        with pytest.raises(RateLimited):
+            await github.get_json("/users/other")
+        return first, stale
+
+    first, stale = run(scenario())
+    assert first == stale == {"login": "octocat", "version": 1}
+    assert len(upstream.state["requests"]) == 1
+    assert github.counters["stale"] == 1
+
+def test_304s_keep_working_on_an_empty_bucket(github, upstream, monkeypatch):
+    monkeypatch.setattr(github_client, "GITHUB_CACHE_FRESH_SECONDS", 0)
+    monkeypatch.setattr(github_client, "GITHUB_CACHE_SWR_SECONDS", 0)
+    monkeypatch.setattr(github_client, "GITHUB_MAX_WAIT", 0)
+    github.buckets["core"] = TokenBucket(rate=1e-6, capacity=1)
+
+    async def scenario():
+        for _ in range(5):
+            await github.get_json("/users/octocat")
+
+    run(scenario())
+    assert len(upstream.state["requests"]) == 5
+    assert github.counters["revalidated"] == 4
+    assert github.counters["throttled"] == 0
+
+def test_stale_while_revalidate(github, upstream, monkeypatch):
+    monkeypatch.setattr(github_client, "GITHUB_CACHE_FRESH_SECONDS", 0)
+
+    async def scenario():
+        first = await github.get_json("/users/octocat")
+        upstream.state["version"] = 2
+        stale = await github.get_json("/users/octocat")
+        pending = list(github._revalidating.values())
+        await asyncio.gather(*pending)
+        refreshed = await github.get_json("/users/octocat")
+        await asyncio.gather(*github._revalidating.values())
+        return first, stale, pending, refreshed
+
+    first, stale, pending, refreshed = run(scenario())
+    assert first == stale == {"login": "octocat", "version": 1}
+    assert len(pending) == 1
+    assert refreshed == {"login": "octocat", "version": 2}
+    assert github.counters["background"] == 2
+    assert upstream.state["requests"][1]["if_none_match"] == '"octocat-1"'
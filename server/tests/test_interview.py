@@ -0,0 +1,19 @@
+from ai_engine import score_from_matches
+from interview import InterviewAnalysis, analyze_text, build_automaton
+
+def test_required_skills_outside_the_vocabulary_are_matched():
+    result = analyze_text("I have shipped services in Rust and Elixir and python", ["rust", "elixir"])
+    assert {s["skill"] for s in result["skills"]} == {"Python", "rust", "elixir"}
+    assert result["skill_score"] == score_from_matches(2, 2)
+
+def test_required_skill_already_in_the_vocabulary_is_counted_once():
+    result = analyze_text("Python, mostly python", ["python"])
+    assert result["skills"] == [{"skill": "Python", "mentions": 2}]
+
+def test_required_skills_match_across_chunks():
+    analysis = InterviewAnalysis(build_automaton(), ["Elixir Phoenix"])
+    analysis.feed("we built it on elixir ")
+    analysis.feed("phoenix last year")
+    scores = analysis.finish()
+    assert scores["skills"] == [{"skill": "Elixir Phoenix", "mentions": 1}]
+    assert scores["words"] == 8
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import jobs
+import models
+from database import Base
+from jobs import JobQueue, MemoryQueueBackend, SQLQueueBackend
+
+@pytest.fixture(params=["memory", "db"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryQueueBackend()
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine, tables=[models.Job.__table__])
+    return SQLQueueBackend(sessionmaker(bind=engine))
+
+def orphan(backend, job_id):
+    """Claims a job as a worker would, then lets its lock go stale as if the worker died."""
+    job = backend.claim()
+    assert job["id"] == job_id
+    backend.update(job_id, locked_at=time.time() - jobs.JOB_LOCK_TIMEOUT - 1)
+
+def test_orphaned_job_fails_after_max_attempts(backend):
+    job_id = backend.enqueue("poison", {}, max_attempts=2)
+    orphan(backend, job_id)
+    assert backend.requeue_stale(time.time() - jobs.JOB_LOCK_TIMEOUT) == 1
+    assert backend.get(job_id)["status"] == "queued"
+    orphan(backend, job_id)
+    assert backend.requeue_stale(time.time() - jobs.JOB_LOCK_TIMEOUT) == 1
+    job = backend.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 2, jobs.JOB_LOST_ERROR)
+    assert backend.claim() is None
+
+def test_idle_workers_sweep_without_a_restart(backend, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_POLL_SECONDS", 0.01)
+    queue = JobQueue(backend, concurrency=1)
+    ran = []
+
+    @queue.handler("work")
+    async def work(payload, ctx):
+        ran.append(payload)
+        return {}
+
+    job_id = backend.enqueue("work", {"n": 1})
+    orphan(backend, job_id)
+
+    async def scenario():
+        # Only the worker loop runs here, not start()'s sweep
+        queue._wakeup = asyncio.Event()
+        worker = asyncio.create_task(queue._worker())
+        try:
+            for _ in range(200):
+                if (await queue.get(job_id))["status"] == "done":
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        return await queue.get(job_id)
+
+    assert asyncio.run(scenario())["status"] == "done"
+    assert ran == [{"n": 1}]
+
+def test_progress_renews_the_lock(backend):
+    queue = JobQueue(backend)
+    job_id = backend.enqueue("long", {})
+    job = backend.claim()
+    backend.update(job_id, locked_at=time.time() - jobs.JOB_LOCK_TIMEOUT - 1)
+    asyncio.run(jobs.JobContext(queue, job).progress(50, "halfway"))
+    assert backend.requeue_stale(time.time() - jobs.JOB_LOCK_TIMEOUT) == 0
+    assert backend.get(job_id)["status"] == "running"
@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+
+import crud
+import main
+from database import QueryCounter, SessionLocal
+
+def signup(client, email):
+    token = client.post("/auth/signup", json={"email": email, "password": "pw123456"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def queries_for_page(client, headers, limit):
+    with QueryCounter() as counter:
+        resp = client.get("/api/profiles", params={"limit": limit}, headers=headers)
+    assert resp.status_code == 200
+    assert len(resp.json()["users"]) == limit
+    return counter.count
+
+def test_profile_pages_take_a_constant_number_of_queries():
+    with TestClient(main.app) as client:
+        headers = signup(client, "pager@example.com")
+        for i in range(9):
+            user_headers = signup(client, f"member{i}@example.com")
+            client.put("/api/profile", json={"full_name": f"Member {i}", "skills": ["Python"]}, headers=user_headers)
+        with SessionLocal() as db:
+            for user in crud.list_users(db, 0, 10):
+                crud.create_certificate(db, user.id, "cert.pdf", "", f"http://testserver/uploads/{user.id}_cert.pdf")
+
+        queries_for_page(client, headers, 1)  # warms the token cache
+        assert queries_for_page(client, headers, 1) == queries_for_page(client, headers, 10)
+
+def test_profile_pages_hide_email_addresses():
+    with TestClient(main.app) as client:
+        headers = signup(client, "private@example.com")
+        users = client.get("/api/profiles", params={"limit": 200}, headers=headers).json()["users"]
+        assert users and all("email" not in user for user in users)
+        assert client.get("/api/me", headers=headers).json()["email"] == "private@example.com"
@@ -0,0 +1,24 @@
+import random
+
+from ai_engine import SkillMatrix
+from teams import form_teams
+
+SKILLS = [f"Skill {i}" for i in range(12)]
+
+def make_pool(n, seed=0):
+    rng = random.Random(seed)
+    candidates = [{"id": i, "name": f"Candidate {i}", "skills": rng.sample(SKILLS, 3)} for i in range(n)]
+    return candidates, SkillMatrix([c["skills"] for c in candidates])
+
+def test_exhausted_time_budget_still_returns_full_teams():
+    candidates, matrix = make_pool(3000)
+    result = form_teams(candidates, matrix, SKILLS[:8], team_size=4, max_teams=3, time_budget=0)
+    assert result["teams"]
+    assert all(len(team["members"]) == 4 for team in result["teams"])
+
+def test_small_pool_is_searched_exactly():
+    candidates, matrix = make_pool(6)
+    result = form_teams(candidates, matrix, SKILLS, team_size=2, max_teams=10)
+    assert all(len(team["members"]) == 2 for team in result["teams"])
+    coverages = [team["coverage"] for team in result["teams"]]
+    assert coverages == sorted(coverages, reverse=True)
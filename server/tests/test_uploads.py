@@ -0,0 +1,58 @@
+import time
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import uploads
+
+SHA = "ab" + "0" * 62
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "THUMBNAIL_DIR", str(tmp_path / "thumbnails"))
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / f"{SHA}.pdf").write_bytes(b"%PDF-1.4 test")
+    (tmp_path / "thumbnails").mkdir()
+    (tmp_path / "thumbnails" / f"{SHA}.png").write_bytes(b"\x89PNG test")
+    app = FastAPI()
+
+    @app.get("/certificates/thumbnails/{name}")
+    async def thumbnail(request: Request, name: str):
+        return await uploads.serve_thumbnail(request, name)
+
+    @app.get("/certificates/{name}")
+    async def certificate(request: Request, name: str):
+        return await uploads.serve_certificate(request, name)
+
+    return TestClient(app, base_url="http://testserver")
+
+def test_unsigned_links_are_cached_publicly_for_good(client, monkeypatch):
+    monkeypatch.setattr(uploads, "CERT_SIGNED_URLS", False)
+    resp = client.get(f"/certificates/{SHA}.pdf")
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == uploads.IMMUTABLE_CACHE_CONTROL
+
+def test_signed_links_are_cached_privately_until_they_expire(client, monkeypatch):
+    monkeypatch.setattr(uploads, "CERT_SIGNED_URLS", True)
+    url = uploads.sign_certificate_url(f"http://testserver/certificates/{SHA}.pdf")
+    expires = int(url.split("expires=")[1].split("&")[0])
+    for resp in (client.get(url), client.get(url, headers={"If-None-Match": f'"{SHA}"'})):
+        assert resp.status_code in (200, 304)
+        directives = dict(d.strip().partition("=")[::2] for d in resp.headers["cache-control"].split(","))
+        assert "private" in directives and "public" not in directives and "immutable" not in directives
+        assert 0 < int(directives["max-age"]) <= expires - time.time() + 1
+    assert client.get(f"/certificates/{SHA}.pdf").status_code == 403
+
+def test_thumbnails_follow_the_certificate_rules(client, monkeypatch):
+    monkeypatch.setattr(uploads, "CERT_SIGNED_URLS", False)
+    resp = client.get(f"/certificates/thumbnails/{SHA}.png")
+    assert resp.status_code == 200 and resp.headers["content-type"] == "image/png"
+    assert client.get("/certificates/thumbnails/..%2Fab.png").status_code == 404
+
+    monkeypatch.setattr(uploads, "CERT_SIGNED_URLS", True)
+    assert client.get(f"/certificates/thumbnails/{SHA}.png").status_code == 403
+    url = uploads.sign_certificate_url(f"http://testserver/certificates/thumbnails/{SHA}.png")
+    resp = client.get(url)
+    assert resp.status_code == 200 and resp.headers["cache-control"].startswith("private")
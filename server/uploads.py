@@ -0,0 +1,345 @@
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlencode, urlsplit
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+
+from auth import SECRET_KEY
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+# First-page previews, named after the certificate's SHA-256
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", os.path.join(UPLOAD_DIR, "thumbnails"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_FIELD_BYTES = 64 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+SAFE_EXTENSION_RE = re.compile(r"^\.[a-z0-9]{1,10}$")
+CONTENT_NAME_RE = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]{1,10})?$")
+THUMBNAIL_NAME_RE = re.compile(r"^([0-9a-f]{64})\.png$")
+
+# Base URL written into certificate links; defaults to the URL the request came in on
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+# Signed mode: links carry ?expires=&sig= (HMAC-SHA256 over path and expiry), optionally
+# pointing at a CDN/proxy base that checks the signature and serves the file itself
+CERT_SIGNED_URLS = os.getenv("CERT_SIGNED_URLS", "0").lower() in ("1", "true", "yes")
+CERT_URL_TTL = int(os.getenv("CERT_URL_TTL", "3600"))
+CERT_CDN_BASE_URL = os.getenv("CERT_CDN_BASE_URL", "").rstrip("/")
+CERT_URL_SECRET = os.getenv("CERT_URL_SECRET", SECRET_KEY).encode()
+# e.g. "X-Accel-Redirect" to let nginx send the file; the value is CERT_SENDFILE_PREFIX + path
+CERT_SENDFILE_HEADER = os.getenv("CERT_SENDFILE_HEADER", "")
+CERT_SENDFILE_PREFIX = os.getenv("CERT_SENDFILE_PREFIX", "/protected-uploads").rstrip("/")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@dataclass
+class StoredUpload:
+    sha256: str
+    size: int
+    path: str            # relative to the server root, e.g. uploads/ab/ab12....pdf
+    filename: str        # name the client sent
+    content_type: Optional[str]
+    duplicate: bool      # identical content was already on disk
+    fields: Dict[str, str]
+
+def content_path(sha256, filename):
+    extension = os.path.splitext(filename or "")[1].lower()
+    if not SAFE_EXTENSION_RE.match(extension):
+        extension = ""
+    return os.path.join(UPLOAD_DIR, sha256[:2], f"{sha256}{extension}")
+
+def too_large():
+    return HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte limit")
+
+class _FileSink:
+    """
+    Receives one file part: hashes it and writes it to a temp file off the event loop.
+    """
+    def __init__(self):
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.handle = None
+
+    async def open(self):
+        tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+        await run_in_threadpool(os.makedirs, tmp_dir, exist_ok=True)
+        # Same filesystem as the final location, so the move is an atomic rename
+        self.handle = await run_in_threadpool(
+            tempfile.NamedTemporaryFile, dir=tmp_dir, delete=False
+        )
+
+    async def write(self, data):
+        self.size += len(data)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise too_large()
+        self.hasher.update(data)
+        await run_in_threadpool(self.handle.write, data)
+
+    async def discard(self):
+        if self.handle is not None:
+            await run_in_threadpool(self.handle.close)
+            await run_in_threadpool(_remove_quietly, self.handle.name)
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _commit(tmp_path, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.exists(target):
+        os.remove(tmp_path)
+        return True
+    os.replace(tmp_path, target)
+    return False
+
+async def receive_upload(request: Request, field="file"):
+    """
+    Streams a multipart request body to disk in fixed-size chunks, storing the `field` file
+    content-addressed by SHA-256. Small text fields are returned alongside it.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+        raise too_large()
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    state = {"headers": {}, "field": b"", "value": b"", "name": None, "filename": None}
+    pending = []       # chunks of the target file parsed but not yet written
+    fields = {}
+    meta = {}
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["name"] = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        state["filename"] = filename.decode("utf-8", "replace") if filename is not None else None
+        if state["name"] == field and state["filename"] is not None and "filename" not in meta:
+            meta["filename"] = os.path.basename(state["filename"].replace("\\", "/"))
+            meta["content_type"] = state["headers"].get(b"content-type", b"").decode("latin-1") or None
+            state["target"] = True
+        else:
+            state["target"] = False
+            if state["filename"] is None:
+                fields.setdefault(state["name"], b"")
+
+    def on_part_data(data, start, end):
+        if state["target"]:
+            pending.append(data[start:end])
+        elif state["filename"] is None:
+            value = fields[state["name"]] + data[start:end]
+            if len(value) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail="Form field too large")
+            fields[state["name"]] = value
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    sink = _FileSink()
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+                raise too_large()
+            parser.write(chunk)
+            if pending:
+                if sink.handle is None:
+                    await sink.open()
+                data = b"".join(pending)
+                pending.clear()
+                await sink.write(data)
+        parser.finalize()
+
+        if "filename" not in meta:
+            raise HTTPException(status_code=400, detail=f"Missing file field '{field}'")
+        if sink.handle is None:
+            await sink.open()
+        await run_in_threadpool(sink.handle.close)
+
+        sha256 = sink.hasher.hexdigest()
+        target = content_path(sha256, meta["filename"])
+        duplicate = await run_in_threadpool(_commit, sink.handle.name, target)
+    except BaseException:
+        await sink.discard()
+        raise
+
+    return StoredUpload(
+        sha256=sha256,
+        size=sink.size,
+        path=target.replace(os.sep, "/"),
+        filename=meta["filename"],
+        content_type=meta["content_type"],
+        duplicate=duplicate,
+        fields={k: v.decode("utf-8", "replace") for k, v in fields.items()},
+    )
+
+# --- Serving ---
+
+def certificate_url(request: Request, stored: StoredUpload):
+    """
+    Canonical (unsigned) link for a stored upload; signing happens when it is handed out.
+    """
+    base = PUBLIC_BASE_URL or str(request.base_url).rstrip("/")
+    return f"{base}/certificates/{os.path.basename(stored.path)}"
+
+def thumbnail_url(request: Request, sha256):
+    """Unsigned link to a certificate's thumbnail, once the job has rendered it."""
+    base = PUBLIC_BASE_URL or str(request.base_url).rstrip("/")
+    return f"{base}/certificates/thumbnails/{sha256}.png"
+
+def url_signature(path, expires):
+    return hmac.new(CERT_URL_SECRET, f"{path}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def sign_certificate_url(url, now=None):
+    """
+    In signed mode, returns url with an expiring signature (and the CDN base, if any).
+    Other URLs, such as legacy /uploads links, pass through unchanged.
+    """
+    if not CERT_SIGNED_URLS or not url:
+        return url
+    parts = urlsplit(url)
+    if not parts.path.startswith("/certificates/"):
+        return url
+    # Round expiry to the TTL so repeated reads hand out the same (cacheable) URL
+    now = int(now if now is not None else time.time())
+    expires = (now // CERT_URL_TTL + 2) * CERT_URL_TTL
+    base = CERT_CDN_BASE_URL or f"{parts.scheme}://{parts.netloc}"
+    query = urlencode({"expires": expires, "sig": url_signature(parts.path, expires)})
+    return f"{base}{parts.path}?{query}"
+
+def verify_signed_request(request: Request):
+    """Checks a signed link; returns its expiry (epoch seconds)."""
+    expires = request.query_params.get("expires", "")
+    signature = request.query_params.get("sig", "")
+    if not expires.isdigit() or int(expires) < time.time():
+        raise HTTPException(status_code=403, detail="Link expired")
+    expected = url_signature(request.url.path, int(expires))
+    if not hmac.compare_digest(expected, signature):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    return int(expires)
+
+def is_legacy_name(path):
+    """
+    Uploads stored before content addressing sit directly in UPLOAD_DIR as <user>_<name>.
+    Everything else (content-addressed files, thumbnails, in-progress uploads) is in a
+    subdirectory.
+    """
+    return bool(path) and "/" not in path and os.sep not in path and not path.startswith(".") \
+        and not CONTENT_NAME_RE.match(path)
+
+class LegacyUploads(StaticFiles):
+    """
+    The /uploads mount, limited to legacy file names so signed, content-addressed
+    certificates are only reachable through serve_certificate.
+    """
+    async def get_response(self, path, scope):
+        if not is_legacy_name(path):
+            raise HTTPException(status_code=404, detail="Not found")
+        return await super().get_response(path, scope)
+
+def etag_matches(request: Request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in header.split(",")]
+
+def cache_headers(request: Request, etag):
+    """
+    ETag plus caching policy. Signed links are only cacheable privately, and no longer
+    than they stay valid; anything else is content-addressed and never changes.
+    """
+    cache_control = IMMUTABLE_CACHE_CONTROL
+    if CERT_SIGNED_URLS:
+        expires = verify_signed_request(request)
+        cache_control = f"private, max-age={max(0, expires - int(time.time()))}"
+    return {"etag": etag, "cache-control": cache_control}
+
+async def serve_certificate(request: Request, name):
+    """
+    Serves a content-addressed upload with a strong ETag (its SHA-256), 304 revalidation,
+    Range support and immutable caching. Uses the server's zero-copy path when available.
+    """
+    match = CONTENT_NAME_RE.match(name)
+    if not match:
+        raise HTTPException(status_code=404, detail="Not found")
+    headers = cache_headers(request, f'"{match.group(1)}"')
+    if etag_matches(request, headers["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    relative = os.path.join(name[:2], name)
+    path = os.path.join(UPLOAD_DIR, relative)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if CERT_SENDFILE_HEADER:
+        # The front proxy streams the file; Python only authorizes and sets headers
+        headers[CERT_SENDFILE_HEADER] = f"{CERT_SENDFILE_PREFIX}/{relative}"
+        return Response(media_type=media_type, headers=headers)
+
+    return FileResponse(
+        path,
+        media_type=media_type,
+        stat_result=stat_result,
+        headers=headers,
+        content_disposition_type="inline",
+    )
+
+async def serve_thumbnail(request: Request, name):
+    """
+    Serves a rendered thumbnail under the same signing and caching rules as certificates.
+    """
+    match = THUMBNAIL_NAME_RE.match(name)
+    if not match:
+        raise HTTPException(status_code=404, detail="Not found")
+    # Not the certificate's own ETag: it's a different representation
+    headers = cache_headers(request, f'"{match.group(1)}-thumbnail"')
+    if etag_matches(request, headers["etag"]):
+        return Response(status_code=304, headers=headers)
+    path = os.path.join(THUMBNAIL_DIR, name)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, media_type="image/png", stat_result=stat_result, headers=headers,
+                        content_disposition_type="inline")